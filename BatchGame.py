@@ -0,0 +1,157 @@
+import random
+import numpy as np
+
+from Game import Game, line_directions
+from GameBot import board_conditions, score_conditions
+
+# Lines through each point for each board size, see get_line_points
+line_points_cache = {}
+
+
+def get_line_points(size):
+    """
+    Returns an array (size * size, 4, 9) of the point numbers on the 4 lines through each point,
+    from 4 points before it to 4 points after it. Points off the board are -1
+    """
+    if size not in line_points_cache:
+        lines = np.full((size * size, 4, 9), -1, dtype=int)
+        for point_num in range(size * size):
+            x, y = point_num % size, point_num // size
+            for n, (dx, dy) in enumerate(line_directions):
+                for i in range(9):
+                    x1, y1 = x + dx * (i - 4), y + dy * (i - 4)
+                    if 0 <= x1 < size and 0 <= y1 < size:
+                        lines[point_num, n, i] = y1 * size + x1
+        line_points_cache[size] = lines
+    return line_points_cache[size]
+
+
+class BatchGame:
+    """
+    Many games of the same size stepped together, for rollouts and training
+    boards[b] is game b's board indexed [y][x], same as Game.board
+    """
+
+    def __init__(self, batch_size, size=19, auto_reset=True):
+        """auto_reset: reset finished boards at the end of step, after saving them in finished_games"""
+        self.batch_size = batch_size
+        self.size = size
+        self.auto_reset = auto_reset
+        self.boards = np.zeros((batch_size, size, size), dtype=np.int8)
+        # moves[b, :move_counts[b]] are the point numbers played on board b
+        self.moves = np.full((batch_size, size * size), -1, dtype=np.int16)
+        self.move_counts = np.zeros(batch_size, dtype=int)
+        # Same as Game.check_game_status. -1: board filled. 0: nothing. 1/2: won
+        self.status = np.zeros(batch_size, dtype=np.int8)
+        # (moves, status) of boards reset by auto_reset, in the order they finished
+        self.finished_games = []
+        self.line_points = get_line_points(size)
+
+    def reset(self, indices=None):
+        """Clears the boards at indices (default: all)"""
+        if indices is None:
+            indices = np.arange(self.batch_size)
+        self.boards[indices] = 0
+        self.moves[indices] = -1
+        self.move_counts[indices] = 0
+        self.status[indices] = 0
+
+    def load(self, index, moves):
+        """Replaces board index with the position after moves (point numbers, alternating sides from 1)"""
+        self.load_game(index, Game(size=self.size, moves=list(moves)))
+
+    def load_game(self, index, game):
+        """Replaces board index with a copy of game's position"""
+        self.boards[index] = game.board
+        self.moves[index] = -1
+        self.moves[index, :len(game.moves)] = game.moves
+        self.move_counts[index] = len(game.moves)
+        self.status[index] = game.check_game_status()
+
+    def current_sides(self):
+        """Returns the side to move (1 or 2) on every board"""
+        return 1 + self.move_counts % 2
+
+    def step(self, moves):
+        """
+        Places moves[b] (a point number) for the side to move on every board b. Negative moves are skipped
+        Returns (legal, status, done) arrays
+            legal: whether the move was placed. Illegal moves leave the board unchanged
+            status: same as Game.check_game_status after the move
+            done: whether the game is finished (status != 0)
+        """
+        moves = np.asarray(moves, dtype=int)
+        boards = self.boards.reshape(self.batch_size, -1)
+        legal = (moves >= 0) & (moves < self.size * self.size) & (self.status == 0)
+        indices = np.nonzero(legal)[0]
+        legal[indices] = boards[indices, moves[indices]] == 0
+        indices = indices[legal[indices]]
+
+        # Place pieces
+        sides = self.current_sides()[indices]
+        points = moves[indices]
+        boards[indices, points] = sides
+        self.moves[indices, self.move_counts[indices]] = points
+        self.move_counts[indices] += 1
+
+        # Check win on the 4 lines through each placed piece: any 5 consecutive points of the side
+        lines = self.line_points[points]  # (n, 4, 9)
+        pieces = (boards[indices[:, None, None], np.maximum(lines, 0)] == sides[:, None, None]) & (lines >= 0)
+        cumulative = np.concatenate([np.zeros(pieces.shape[:2] + (1,), dtype=int), pieces.cumsum(axis=2)], axis=2)
+        won = ((cumulative[:, :, 5:] - cumulative[:, :, :-5]) == 5).any(axis=(1, 2))
+
+        status = self.status
+        status[indices] = np.where(won, sides, 0)
+        full = (self.move_counts[indices] == self.size * self.size) & ~won
+        status[indices[full]] = -1
+
+        status = status.copy()
+        done = status != 0
+        if self.auto_reset and done.any():
+            finished = np.nonzero(done)[0]
+            for b in finished:
+                self.finished_games.append((self.moves[b, :self.move_counts[b]].tolist(), int(status[b])))
+            self.reset(finished)
+        return legal, status, done
+
+    def get_game(self, index):
+        """Returns board index as a Game"""
+        return Game(size=self.size, moves=self.moves[index, :self.move_counts[index]].tolist())
+
+
+class BatchGameBot:
+    """Picks the same moves as GameBot for the side to move on every board of a BatchGame at once"""
+
+    def __init__(self, batch_game):
+        self.batch_game = batch_game
+
+    def get_scores(self):
+        """Returns GameBot scores (batch_size, size, size) for the side to move on each board, indexed [b][x][y]"""
+        # Conditions of side 2 are the conditions of side 1 swapped
+        win_conditions, lose_conditions = board_conditions(self.batch_game.boards, 1)
+        # Finished boards can have 5 pieces in a condition, clip so they can still be scored
+        win_conditions = np.minimum(win_conditions, 4)
+        lose_conditions = np.minimum(lose_conditions, 4)
+        side_2 = (self.batch_game.current_sides() == 2)[:, None, None, None]
+        own = np.where(side_2, lose_conditions, win_conditions)
+        opponent = np.where(side_2, win_conditions, lose_conditions)
+        return score_conditions(own, opponent)
+
+    def get_next_moves(self, rng=random):
+        """
+        Returns the point number of the next move for every board, or -1 for finished boards
+        Ties are broken with rng.choice board by board, same as calling GameBot.get_next_move on each in order
+        """
+        batch_game = self.batch_game
+        # Scores indexed [b][y][x], with occupied points set to -1
+        scores = np.swapaxes(self.get_scores(), 1, 2)
+        scores[batch_game.boards != 0] = -1
+        scores = scores.reshape(batch_game.batch_size, -1)
+        highest = scores.max(axis=1)
+
+        moves = np.full(batch_game.batch_size, -1, dtype=int)
+        for b in range(batch_game.batch_size):
+            if batch_game.status[b] == 0 and highest[b] >= 0:
+                # Best points in the same order as iterating y, then x
+                moves[b] = rng.choice(np.nonzero(scores[b] == highest[b])[0])
+        return moves
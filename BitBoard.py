@@ -0,0 +1,232 @@
+from Game import Game, candidate_radius
+
+# Line directions (dx, dy) of BitBoard.shifts and BitBoard.lines: horizontal, vertical, SE and SW
+bit_directions = ((1, 0), (0, 1), (1, 1), (-1, 1))
+
+# Line layouts for each board size, see get_line_offsets
+line_offset_cache = {}
+
+
+def get_five_window_table():
+    """
+    Returns a list of 512 bools: whether the 9 bit window (the 4 points on each side of a point on a line,
+    and the point) has five bits in a row, found with shift-and
+    """
+    table = []
+    for window in range(512):
+        pairs = window & (window >> 1)
+        table.append(bool(pairs & (pairs >> 2) & (window >> 4)))
+    return table
+
+
+five_window_table = get_five_window_table()
+
+
+def get_line_offsets(size):
+    """
+    Returns offsets[point_num], for each direction of bit_directions the bit of the point in the line bit sets
+    of BitBoard.lines, minus 4. Generated once per board size
+    The lines of a direction are laid out one after another with 4 empty bits before each (and after the last),
+    so bits offset to offset + 8 hold only the 9 points of the line around the point
+    """
+    if size not in line_offset_cache:
+        offsets = [[0] * len(bit_directions) for _ in range(size * size)]
+        for n, (dx, dy) in enumerate(bit_directions):
+            bit = 4
+            for y in range(size):
+                for x in range(size):
+                    if 0 <= x - dx < size and 0 <= y - dy < size:
+                        continue  # not the first point of its line
+                    x1, y1 = x, y
+                    while 0 <= x1 < size and 0 <= y1 < size:
+                        offsets[y1 * size + x1][n] = bit - 4
+                        bit += 1
+                        x1, y1 = x1 + dx, y1 + dy
+                    bit += 4
+        line_offset_cache[size] = [tuple(point_offsets) for point_offsets in offsets]
+    return line_offset_cache[size]
+
+
+def packed_length(size):
+    """Returns the number of bytes of the bits of one side, see BitBoard.to_bytes"""
+    return ((size + 1) * size + 7) // 8
+
+
+class BitBoard:
+    """
+    Compact board storing the pieces of each side as a bit set (python int)
+    Bit for (x, y) is y * stride + x, where stride = size + 1. The extra column on the right is
+    always empty, so shifting a line past the edge of a row lands on padding instead of wrapping
+    Each side also has a bit set per direction with its lines laid out contiguously (see get_line_offsets),
+    so the line through a point is read with a single shift and mask
+    """
+
+    def __init__(self, size=19):
+        self.size = size
+        self.stride = size + 1
+        # bits[side] holds the pieces of side. Index 0 is unused
+        self.bits = [0, 0, 0]
+        # lines[side][n] holds the pieces of side in the line layout of direction n
+        self.lines = [None, [0] * len(bit_directions), [0] * len(bit_directions)]
+        self.offsets = get_line_offsets(size)
+        # Shifts for horizontal, vertical, SE and SW lines (bit_directions)
+        self.shifts = (1, self.stride, self.stride + 1, self.stride - 1)
+
+    def bit(self, point):
+        x, y = point
+        return 1 << (y * self.stride + x)
+
+    def get(self, point):
+        """Returns value at point (0: empty, 1/2: side). Point must be valid"""
+        bit = self.bit(point)
+        if self.bits[1] & bit:
+            return 1
+        if self.bits[2] & bit:
+            return 2
+        return 0
+
+    def set(self, point, value):
+        """Sets the point (x, y) to value. Point must be valid"""
+        x, y = point
+        bit = self.bit(point)
+        offsets = self.offsets[y * self.size + x]
+        for side in [1, 2]:
+            if side == value:
+                self.bits[side] |= bit
+                self.lines[side] = [line | 16 << offset for line, offset in zip(self.lines[side], offsets)]
+            elif self.bits[side] & bit:
+                self.bits[side] &= ~bit
+                self.lines[side] = [line & ~(16 << offset) for line, offset in zip(self.lines[side], offsets)]
+
+    def has_five(self, side):
+        """Returns whether side has five in a row, using shift-and on each direction"""
+        bits = self.bits[side]
+        for shift in self.shifts:
+            # Bit i of pairs is set if i and i + shift are both occupied
+            pairs = bits & (bits >> shift)
+            fours = pairs & (pairs >> (2 * shift))
+            if fours & (bits >> (4 * shift)):
+                return True
+        return False
+
+    def has_five_at(self, point, side):
+        """Returns whether the piece of side at point is part of five in a row, from the 4 lines through point"""
+        x, y = point
+        offset0, offset1, offset2, offset3 = self.offsets[y * self.size + x]
+        line0, line1, line2, line3 = self.lines[side]
+        table = five_window_table
+        return (table[line0 >> offset0 & 511] or table[line1 >> offset1 & 511] or
+                table[line2 >> offset2 & 511] or table[line3 >> offset3 & 511])
+
+    def to_list(self):
+        """Returns the board as a 2d list, same as Game.board"""
+        return [[self.get((x, y)) for x in range(self.size)] for y in range(self.size)]
+
+    def from_list(self, board):
+        """Loads the pieces from a 2d list, same as Game.board"""
+        self.load_bits(0, 0)
+        for y, row in enumerate(board):
+            for x, value in enumerate(row):
+                if value in [1, 2]:
+                    self.set((x, y), value)
+
+    def to_bytes(self):
+        """Returns the bits of side 1, then side 2, as 2 * packed_length(size) bytes (little endian)"""
+        length = packed_length(self.size)
+        return self.bits[1].to_bytes(length, 'little') + self.bits[2].to_bytes(length, 'little')
+
+    def load_bits(self, bits1, bits2):
+        """Loads the pieces from the bit sets of each side, e.g. from BitGame.pack"""
+        self.bits = [0, 0, 0]
+        self.lines = [None, [0] * len(bit_directions), [0] * len(bit_directions)]
+        for side, bits in [(1, bits1), (2, bits2)]:
+            for y in range(self.size):
+                row = bits >> (y * self.stride)
+                for x in range(self.size):
+                    if row >> x & 1:
+                        self.set((x, y), side)
+
+
+class BitGame(Game):
+    """
+    Game backed by a BitBoard instead of a 2d list
+    Checks for five in a row with a few big int operations. Positions held in bulk should be kept as pack()
+    (or pack_bytes()) and restored with from_packed (from_bytes) when needed.
+    board is still available as a 2d list, but it is rebuilt on every access
+    """
+
+    @property
+    def board(self):
+        return self.bitboard.to_list()
+
+    @board.setter
+    def board(self, board):
+        self.bitboard = BitBoard(len(board))
+        self.bitboard.from_list(board)
+
+    @classmethod
+    def from_packed(cls, packed, moves=None, radius=candidate_radius):
+        """
+        Returns the game of a position from pack(). Without moves (not stored by pack), moves is empty
+        and only the board, hashes, candidates and winners are restored
+        """
+        size, bits1, bits2 = packed
+        game = cls.__new__(cls)
+        game.radius = radius
+        game.size = size
+        game.bitboard = BitBoard(size)
+        game.bitboard.load_bits(bits1, bits2)
+        game.moves = list(moves) if moves else []
+        game.init_status()
+        return game
+
+    @classmethod
+    def from_bytes(cls, size, data, moves=None, radius=candidate_radius):
+        """Returns the game of a position from pack_bytes(), see from_packed"""
+        length = packed_length(size)
+        bits1 = int.from_bytes(data[:length], 'little')
+        bits2 = int.from_bytes(data[length:2 * length], 'little')
+        return cls.from_packed((size, bits1, bits2), moves, radius)
+
+    def get_point(self, point):
+        x, y = point
+        if 0 <= x < self.size and 0 <= y < self.size:
+            bits = self.bitboard.bits
+            bit = 1 << (y * self.bitboard.stride + x)
+            return 1 if bits[1] & bit else 2 if bits[2] & bit else 0
+        return -1
+
+    def set_point(self, point, value):
+        """Set the point (x, y) to value"""
+        if self.point_is_valid(point):
+            self.bitboard.set(point, value)
+            return True
+        return False
+
+    def add_neighbor(self, point_num):
+        """Updates candidates after a piece was placed at point_num, checking emptiness on the bit sets"""
+        counts = self.neighbor_counts
+        candidates = self.candidates
+        candidates.discard(point_num)
+        size = self.size
+        stride = self.bitboard.stride
+        occupied = self.bitboard.bits[1] | self.bitboard.bits[2]
+        for neighbor in self.neighbors[point_num]:
+            counts[neighbor] += 1
+            if counts[neighbor] == 1 and not occupied >> (neighbor // size * stride + neighbor % size) & 1:
+                candidates.add(neighbor)
+
+    def check_five_at(self, point, side):
+        """Returns whether the piece of side at point is part of five in a row"""
+        return self.bitboard.has_five_at(point, side)
+
+    def pack(self):
+        """
+        Returns the position as a compact tuple (size, side 1 bits, side 2 bits), a few hundred bytes
+        instead of the kilobytes of a game. See from_packed
+        """
+        return self.size, self.bitboard.bits[1], self.bitboard.bits[2]
+
+    def pack_bytes(self):
+        """Returns pack() as bytes, see BitBoard.to_bytes"""
+        return self.bitboard.to_bytes()
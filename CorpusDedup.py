@@ -0,0 +1,127 @@
+import argparse
+import hashlib
+import sqlite3
+from collections import OrderedDict
+
+from Game import Game, get_symmetries
+import GameIO
+
+
+class BoundedSeenSet:
+    """
+    In-memory set of seen keys holding at most max_entries, evicting the least recently seen
+    Duplicates of evicted keys are no longer detected
+    """
+
+    def __init__(self, max_entries=10 ** 7):
+        self.max_entries = max_entries
+        self.keys = OrderedDict()
+        self.evictions = 0
+
+    def add(self, key):
+        """Adds key. Returns whether it was already seen"""
+        if key in self.keys:
+            self.keys.move_to_end(key)
+            return True
+        self.keys[key] = None
+        if len(self.keys) > self.max_entries:
+            self.keys.popitem(last=False)
+            self.evictions += 1
+        return False
+
+    def close(self):
+        pass
+
+
+class DiskSeenSet:
+    """Set of seen keys stored in an sqlite database, for corpora whose keys do not fit in memory"""
+
+    def __init__(self, path, commit_every=10000):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS seen (key INTEGER PRIMARY KEY)')
+        self.commit_every = commit_every
+        self.pending = 0
+
+    def add(self, key):
+        """Adds key (64 bit unsigned). Returns whether it was already seen"""
+        # sqlite integers are signed 64 bit
+        if key >= 1 << 63:
+            key -= 1 << 64
+        cursor = self.connection.execute('INSERT OR IGNORE INTO seen (key) VALUES (?)', (key,))
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.connection.commit()
+            self.pending = 0
+        return cursor.rowcount == 0
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+
+def game_key(size, moves):
+    """Returns a 64 bit key of a move sequence, same for all 8 symmetric versions of the game"""
+    canonical = min(tuple(symmetry[move] for move in moves) for symmetry in get_symmetries(size))
+    data = ' '.join(str(move) for move in (size,) + canonical).encode()
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+def dedup_games(output_path, path=None, mode='position', seen=None, **filters):
+    """
+    Copies the games of path (text or archive, default: GameIO.filename) into output_path (text),
+    skipping duplicates up to symmetry
+    mode: 'game' skips games whose move sequence was seen before
+          'position' skips games whose positions were all seen before, so no distinct position is lost
+    seen: BoundedSeenSet (default) or DiskSeenSet
+    Returns stats dict with duplicate counts and rates
+    """
+    seen = seen if seen is not None else BoundedSeenSet()
+    stats = {'games': 0, 'kept': 0, 'positions': 0, 'duplicate_positions': 0}
+
+    with open(output_path, 'a') as output:
+        for record in GameIO.iter_games(path, **filters):
+            stats['games'] += 1
+            if mode == 'game':
+                is_new = not seen.add(game_key(record.size, record.moves))
+            else:
+                # Replay the game, checking the canonical hash of every position
+                is_new = False
+                game = Game(size=record.size)
+                for move in record.moves:
+                    game.place(game.point_from_num(int(move)), game.get_current_side())
+                    stats['positions'] += 1
+                    if seen.add(game.canonical_hash()):
+                        stats['duplicate_positions'] += 1
+                    else:
+                        is_new = True
+            if is_new:
+                stats['kept'] += 1
+                output.write(record.game_str() + '\n')
+    seen.close()
+
+    stats['duplicate_games'] = stats['games'] - stats['kept']
+    stats['duplicate_game_rate'] = stats['duplicate_games'] / stats['games'] if stats['games'] else 0
+    stats['duplicate_position_rate'] = (stats['duplicate_positions'] / stats['positions']
+                                        if stats['positions'] else 0)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Removes duplicate games (up to symmetry) from saved games')
+    parser.add_argument('output')
+    parser.add_argument('--input', default=None, help='text or archive file, default: ' + GameIO.filename)
+    parser.add_argument('--mode', default='position', choices=['game', 'position'])
+    parser.add_argument('--max-entries', type=int, default=10 ** 7, help='size of the in-memory seen set')
+    parser.add_argument('--seen-db', default=None, help='keep the seen set in this sqlite file instead')
+    args = parser.parse_args()
+
+    seen = DiskSeenSet(args.seen_db) if args.seen_db else BoundedSeenSet(args.max_entries)
+    stats = dedup_games(args.output, path=args.input, mode=args.mode, seen=seen)
+    print('Kept {} of {} games ({:.1%} duplicate)'.format(
+        stats['kept'], stats['games'], stats['duplicate_game_rate']))
+    if args.mode == 'position':
+        print('{} positions, {:.1%} duplicate'.format(stats['positions'], stats['duplicate_position_rate']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import os
+from multiprocessing import Pool
+import numpy as np
+
+from Game import get_symmetries
+import GameIO
+
+# Planes of each position: pieces of the side to move, pieces of the opponent, side to move (all 1 if side 1)
+plane_count = 3
+
+
+def game_positions(size, result, moves, symmetries=False):
+    """
+    Returns (planes, next_moves, results) for every position of a game, before each of its moves
+        planes: uint8 (positions, 3, size, size) indexed [position][plane][y][x]
+        next_moves: int16 (positions,) point number played in the position
+        results: int8 (positions,) final result for the side to move. 1: won, -1: lost, 0: tie / unfinished
+    symmetries: also include the 8 symmetries of every position (positions = 8 * len(moves))
+    """
+    moves = np.asarray(moves, dtype=int)
+    count = len(moves)
+    points = size * size
+
+    # ply[p] is the index of the move played at point p (count if never played)
+    ply = np.full(points, count, dtype=int)
+    ply[moves] = np.arange(count)
+    positions = np.arange(count).reshape(count, 1)
+
+    # Pieces placed before each position, and whether they belong to the side to move
+    placed = ply < positions
+    own = placed & (ply % 2 == positions % 2)
+    opponent = placed & (ply % 2 != positions % 2)
+    side_1 = np.broadcast_to(positions % 2 == 0, (count, points))
+    planes = np.stack([own, opponent, side_1], axis=1).astype(np.uint8)
+
+    sides = 1 + np.arange(count) % 2
+    results = np.where(sides == result, 1, np.where(3 - sides == result, -1, 0)).astype(np.int8)
+    next_moves = moves.astype(np.int16)
+
+    if symmetries:
+        all_planes, all_moves = [], []
+        for symmetry in get_symmetries(size):
+            symmetry = np.array(symmetry)
+            transformed = np.empty_like(planes)
+            transformed[:, :, symmetry] = planes
+            all_planes.append(transformed)
+            all_moves.append(symmetry[next_moves].astype(np.int16))
+        planes = np.concatenate(all_planes)
+        next_moves = np.concatenate(all_moves)
+        results = np.tile(results, 8)
+
+    return planes.reshape(-1, plane_count, size, size), next_moves, results
+
+
+def shard_path(output_dir, index, name):
+    return os.path.join(output_dir, 'shard-{:05d}-{}.npy'.format(index, name))
+
+
+def export_shard(task):
+    """Writes the positions of a list of games into shard files. Returns the number of positions"""
+    output_dir, index, size, games, symmetries = task
+    planes, next_moves, results = [], [], []
+    for result, moves in games:
+        if len(moves) == 0:
+            continue
+        game_planes, game_moves, game_results = game_positions(size, result, moves, symmetries)
+        planes.append(game_planes)
+        next_moves.append(game_moves)
+        results.append(game_results)
+    if len(planes) == 0:
+        return 0
+
+    np.save(shard_path(output_dir, index, 'planes'), np.concatenate(planes))
+    np.save(shard_path(output_dir, index, 'moves'), np.concatenate(next_moves))
+    np.save(shard_path(output_dir, index, 'results'), np.concatenate(results))
+    return sum(len(game_moves) for game_moves in next_moves)
+
+
+def export_dataset(output_dir, size, path=None, games_per_shard=1000, symmetries=False, processes=None,
+                   **filters):
+    """
+    Streams the games of size in path (text or archive, default: GameIO.filename) into shards of .npy files
+    Shard i is shard-0000i-planes.npy, -moves.npy and -results.npy (see game_positions), load with load_shard
+    Shards are written in parallel by a process pool. Returns the total number of positions
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    def tasks():
+        for index, batch in enumerate(GameIO.iter_batches(games_per_shard, path, size=size, **filters)):
+            # Copy moves out of the file, since archive records are memory mapped views
+            games = [(record.result, np.array(record.moves, dtype=int)) for record in batch]
+            yield output_dir, index, size, games, symmetries
+
+    if processes == 1:
+        return sum(export_shard(task) for task in tasks())
+    with Pool(processes) as pool:
+        return sum(pool.imap(export_shard, tasks()))
+
+
+def load_shard(output_dir, index, mmap=True):
+    """Returns (planes, next_moves, results) of shard index, memory mapped unless mmap is False"""
+    mode = 'r' if mmap else None
+    return tuple(np.load(shard_path(output_dir, index, name), mmap_mode=mode)
+                 for name in ['planes', 'moves', 'results'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exports saved games as training tensors')
+    parser.add_argument('output_dir')
+    parser.add_argument('--input', default=None, help='text or archive file, default: ' + GameIO.filename)
+    parser.add_argument('--size', type=int, default=15, help='only games of this board size are exported')
+    parser.add_argument('--games-per-shard', type=int, default=1000)
+    parser.add_argument('--symmetries', action='store_true', help='add the 8 symmetries of every position')
+    parser.add_argument('--processes', type=int, default=None, help='default: number of cores')
+    args = parser.parse_args()
+
+    count = export_dataset(args.output_dir, args.size, path=args.input, games_per_shard=args.games_per_shard,
+                           symmetries=args.symmetries, processes=args.processes)
+    print('Exported {} positions'.format(count))
+
+
+if __name__ == '__main__':
+    main()
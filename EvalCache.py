@@ -0,0 +1,83 @@
+import sys
+import threading
+from collections import OrderedDict
+
+# Cache shared by all bots in this process, see get_shared_cache
+shared_cache = None
+shared_cache_lock = threading.Lock()
+
+
+class EvalCache:
+    """
+    Bounded LRU cache of evaluations keyed by position hash, shareable between bots
+    Bounded by number of entries and optionally by the approximate size of the values in bytes
+    Thread safe, so bots computing moves on different threads (e.g. GameServer) can share it
+    """
+
+    def __init__(self, max_entries=100000, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (value, size)
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """Returns the value cached for key, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size=None):
+        """Caches value for key. size: approximate bytes of value (default: sys.getsizeof)"""
+        if size is None:
+            size = sys.getsizeof(value)
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[1]
+            self.entries[key] = value, size
+            self.bytes += size
+
+            # Evict least recently used entries
+            while len(self.entries) > self.max_entries or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0,
+            }
+
+
+def get_shared_cache():
+    """Returns the EvalCache shared by all bots in this process, creating it on first use"""
+    global shared_cache
+    with shared_cache_lock:
+        if shared_cache is None:
+            shared_cache = EvalCache()
+    return shared_cache
@@ -1,23 +1,143 @@
+import random
+import numpy as np
+
+# Directions checked for five in a row: horizontal, vertical, SE and NE
+line_directions = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+# Zobrist keys for each board size, see get_zobrist_keys
+zobrist_cache = {}
+
+# Board symmetries for each board size, see get_symmetries
+symmetry_cache = {}
+
+# Packed Zobrist keys of the symmetric images of each point for each board size, see get_symmetry_keys
+symmetry_key_cache = {}
+
+# Neighbor points for each board size and radius, see get_neighbors
+neighbor_cache = {}
+
+# Lines of five points for each board size, see get_five_lines
+five_line_cache = {}
+
+# Default radius around pieces in which empty points are candidate moves, see Game.get_candidates
+candidate_radius = 2
+
+
+def get_zobrist_keys(size):
+    """Returns random 64 bit keys indexed [side][point_num], generated once per board size"""
+    if size not in zobrist_cache:
+        rng = random.Random(size)
+        zobrist_cache[size] = [None] + [[rng.getrandbits(64) for _ in range(size * size)] for _ in range(2)]
+    return zobrist_cache[size]
+
+
+def get_symmetries(size):
+    """
+    Returns the 8 symmetries of the board (rotations and reflections), generated once per board size
+    Each symmetry is a list mapping a point_num to the point_num of its image
+    """
+    if size not in symmetry_cache:
+        n = size - 1
+        transforms = [
+            lambda x, y: (x, y),
+            lambda x, y: (n - y, x),
+            lambda x, y: (n - x, n - y),
+            lambda x, y: (y, n - x),
+            lambda x, y: (n - x, y),
+            lambda x, y: (x, n - y),
+            lambda x, y: (y, x),
+            lambda x, y: (n - y, n - x),
+        ]
+        symmetries = []
+        for transform in transforms:
+            symmetry = []
+            for point_num in range(size * size):
+                x, y = transform(point_num % size, point_num // size)
+                symmetry.append(y * size + x)
+            symmetries.append(symmetry)
+        symmetry_cache[size] = symmetries
+    return symmetry_cache[size]
+
+
+def pack_hashes(hashes):
+    """Returns 64 bit hashes packed into one int, hash i in bits 64 * i to 64 * i + 63"""
+    packed = 0
+    for i, value in enumerate(hashes):
+        packed |= value << (64 * i)
+    return packed
+
+
+def get_symmetry_keys(size):
+    """
+    Returns keys indexed [side][point_num]: the Zobrist keys of the point's image by each symmetry of
+    get_symmetries, packed by pack_hashes so all symmetry hashes are updated by one xor. Generated once per board size
+    """
+    if size not in symmetry_key_cache:
+        keys = get_zobrist_keys(size)
+        symmetries = get_symmetries(size)
+        symmetry_key_cache[size] = [None] + [[pack_hashes(keys[side][symmetry[point_num]] for symmetry in symmetries)
+                                              for point_num in range(size * size)] for side in [1, 2]]
+    return symmetry_key_cache[size]
+
+
+def get_neighbors(size, radius):
+    """
+    Returns a list mapping each point_num to the point_nums within radius of it (in both x and y),
+    not including itself. Generated once per board size and radius
+    """
+    key = size, radius
+    if key not in neighbor_cache:
+        neighbors = []
+        for point_num in range(size * size):
+            x, y = point_num % size, point_num // size
+            neighbors.append([y1 * size + x1
+                              for y1 in range(max(0, y - radius), min(size, y + radius + 1))
+                              for x1 in range(max(0, x - radius), min(size, x + radius + 1))
+                              if (x1, y1) != (x, y)])
+        neighbor_cache[key] = neighbors
+    return neighbor_cache[key]
+
+
+def get_five_lines(size):
+    """Returns an array (line count, 5) of the point_nums of every line of five points on the board"""
+    if size not in five_line_cache:
+        lines = []
+        for y in range(size):
+            for x in range(size):
+                for dx, dy in line_directions:
+                    if 0 <= x + 4 * dx < size and 0 <= y + 4 * dy < size:
+                        lines.append([(y + dy * i) * size + x + dx * i for i in range(5)])
+        five_line_cache[size] = np.array(lines, dtype=np.int64).reshape(-1, 5)
+    return five_line_cache[size]
+
 
 class Game:
-    def __init__(self, board=None, size=19, moves=None):
+    def __init__(self, board=None, size=19, moves=None, radius=candidate_radius):
+        """
+        moves: point_nums played alternately from side 1. Without board they are applied at once (see load_moves)
+        radius: empty points within radius of a piece are candidate moves, see get_candidates
+        """
+        self.radius = radius
         if board:
             # initializing with board is not recommended unless if moves is also provided
             self.size = len(board)
             self.board = board
             self.moves = moves if moves else []
+            self.init_status()
         else:
             self.size = size
-            self.init_board(size)
-            if moves:
-                self.moves = moves
-                current_side = 1
-                for move in moves:
-                    point = self.point_from_num(move)
-                    self.place(point, current_side)
-                    current_side = 2 if current_side == 1 else 1
-            else:
-                self.moves = []
+            self.load_moves(moves if moves is not None else [])
+
+    @classmethod
+    def from_moves(cls, moves, size=19, ply=None, radius=candidate_radius):
+        """Returns the game after the first ply moves (default: all), without replaying them one by one"""
+        if ply is not None:
+            moves = moves[:ply]
+        return cls(size=size, moves=moves, radius=radius)
+
+    def position(self, ply):
+        """Returns a new game at the position after the first ply moves of this game, with the same radius"""
+        return self.from_moves(self.moves, self.size, ply, self.radius)
 
     def init_board(self, size):
         """Initializes a board (2d list) with dimensions (width, height)"""
@@ -25,6 +145,148 @@ class Game:
         for _ in range(size):
             self.board.append([0] * size)
 
+    def init_empty_status(self):
+        """Initializes the tracked game status (empty cells, winners, hashes and candidates) of an empty board"""
+        size = self.size
+        # win_moves[side] is the index in moves of the move that first completed five for side,
+        #   or None if side has not won. Index 0 is unused
+        # Moves from checked_moves on haven't been checked for five yet, they are when the status is read
+        #   (see update_win_moves), so placing pieces doesn't pay for it
+        self.win_moves = [None, None, None]
+        self.checked_moves = 0
+        self.empty_count = size * size
+        # zobrist_hash is the Zobrist hash of the position (xor of the keys of every piece on board), read it from hash
+        # packed_symmetry_hashes holds the hash of the position transformed by each symmetry (see get_symmetries),
+        #   packed by pack_hashes. Read them from symmetry_hashes
+        # neighbor_counts[point_num] is the number of pieces within radius of the point
+        # candidates is the set of empty points with a piece within radius, read it from get_candidates
+        # The hashes and candidates are None until first read, then updated by every move (see xor_keys and
+        #   find_candidates), so games that only place pieces and check the status don't pay for them
+        self.zobrist_keys = get_zobrist_keys(size)
+        self.zobrist_hash = 0
+        self.symmetries = get_symmetries(size)
+        self.symmetry_keys = get_symmetry_keys(size)
+        self.packed_symmetry_hashes = None
+        self.neighbors = get_neighbors(size, self.radius)
+        self.neighbor_counts = None
+        self.candidates = None
+
+    def init_status(self):
+        """Initializes the tracked game status from the current board"""
+        self.init_empty_status()
+        self.empty_count = sum(row.count(0) for row in self.board)
+        if self.empty_count == self.size * self.size:
+            return  # nobody has won an empty board
+        for side in [1, 2]:
+            if self.check_win(side, full_scan=True):
+                self.win_moves[side] = max(len(self.moves) - 1, 0)
+        self.checked_moves = len(self.moves)
+        self.zobrist_hash = None
+
+    def load_moves(self, moves):
+        """
+        Replaces the position with moves (point_nums, alternating sides from 1), applied at once
+        Only the board and empty count are set here (by a NumPy scatter), instead of running place for every move.
+        Winners, hashes and candidates are found when first needed
+        Raises ValueError for moves off the board or repeated
+        """
+        size = self.size
+        point_count = size * size
+        if len(moves) == 0:
+            # Plain lists are much cheaper than the array operations for an empty board
+            self.board = [[0] * size for _ in range(size)]
+            self.moves = []
+            self.init_empty_status()
+            return
+        moves = np.asarray(moves, dtype=np.int64).reshape(-1)
+        if moves.min() < 0 or moves.max() >= point_count:
+            raise ValueError('Move off the board')
+        board = np.zeros(point_count, dtype=np.int8)
+        board[moves[0::2]] = 1
+        board[moves[1::2]] = 2
+        if np.count_nonzero(board) != len(moves):
+            raise ValueError('Repeated move')
+
+        self.board = board.reshape(size, size).tolist()
+        self.moves = moves.tolist()
+        self.init_empty_status()
+        self.empty_count = point_count - len(moves)
+        self.zobrist_hash = None
+        # Winners are found when first needed (win_moves is None until then), see find_win_moves
+        self.win_moves = None
+
+    def xor_keys(self, keys):
+        """
+        Returns the xor of keys[side][point_num] of every piece on board, e.g. the hash for zobrist_keys
+        Used on the first read of hash and symmetry_hashes
+        """
+        value = 0
+        size = self.size
+        for y, row in enumerate(self.board):
+            for x, side in enumerate(row):
+                if side:
+                    value ^= keys[side][y * size + x]
+        return value
+
+    def find_candidates(self):
+        """
+        Returns (neighbor_counts, candidates) computed from the board with array operations
+        Used on the first read of the candidates, see get_candidates
+        """
+        size = self.size
+        radius = self.radius
+        board = np.array(self.board, dtype=np.int8)
+        # Pieces within radius of each point: box sum of the pieces around it (from a summed-area table),
+        #   minus its own piece
+        occupied = board != 0
+        width = size + 2 * radius + 1
+        table = np.zeros((width, width), dtype=np.int32)
+        table[radius + 1:radius + 1 + size, radius + 1:radius + 1 + size] = occupied
+        table = table.cumsum(axis=0).cumsum(axis=1)
+        span = 2 * radius + 1
+        counts = (table[span:, span:] - table[:-span, span:] - table[span:, :-span] + table[:-span, :-span] -
+                  occupied).reshape(-1)
+        return counts.tolist(), set(np.nonzero((counts > 0) & ~occupied.reshape(-1))[0].tolist())
+
+    def update_win_moves(self):
+        """Brings win_moves up to date with the moves played since it was last read"""
+        if self.win_moves is None:
+            self.win_moves = self.find_win_moves()
+            self.checked_moves = len(self.moves)
+        win_moves = self.win_moves
+        while self.checked_moves < len(self.moves):
+            point = self.point_from_num(self.moves[self.checked_moves])
+            side = self.get_point(point)
+            if win_moves[side] is None and self.check_five_at(point, side):
+                win_moves[side] = self.checked_moves
+            self.checked_moves += 1
+
+    def find_win_moves(self):
+        """
+        Returns win_moves computed from the board and moves with array operations
+        Used after load_moves, on the first check of the game
+        """
+        point_count = self.size * self.size
+        moves = np.array(self.moves, dtype=np.int64)
+        board = np.zeros(point_count, dtype=np.int8)
+        board[moves[0::2]] = 1
+        board[moves[1::2]] = 2
+        lines = get_five_lines(self.size)
+        values = board[lines]
+        fives = (values[:, 0] != 0) & (values == values[:, :1]).all(axis=1)
+
+        # The move that first completed five for a side is the last played (highest index) of its five points,
+        #   lowest over all fives of the side
+        order = np.zeros(point_count, dtype=np.int64)
+        order[moves] = np.arange(len(moves))
+        completed = order[lines[fives]].max(axis=1)
+        sides = values[fives, 0]
+        win_moves = [None, None, None]
+        for side in [1, 2]:
+            if (sides == side).any():
+                win_moves[side] = int(completed[sides == side].min())
+        return win_moves
+
     def print_board(self):
         """Prints out a formatted board"""
         for row in self.board:
@@ -49,6 +311,128 @@ class Game:
         if self.get_point(point) == 0 and (side in [1, 2]):
             if self.set_point(point, side):
                 self.moves.append(self.point_num(point))
+                self.update_status(point, side)
+                return True
+        return False
+
+    def undo(self):
+        """Removes the last move from the board. Returns its point, or None if there are no moves"""
+        if len(self.moves) == 0:
+            return None
+        move = self.moves.pop()
+        point = self.point_from_num(move)
+        side = self.get_point(point)
+        self.set_point(point, 0)
+
+        # Revert tracked game status
+        self.empty_count += 1
+        self.toggle_hashes(move, side)
+        if self.candidates is not None:
+            self.remove_neighbor(move)
+        if self.win_moves is not None:
+            self.checked_moves = min(self.checked_moves, len(self.moves))
+            if self.win_moves[side] == len(self.moves):
+                self.win_moves[side] = None
+        return point
+
+    def update_status(self, point, side):
+        """Updates the tracked game status after side placed a piece at point"""
+        point_num = self.moves[-1]
+        self.empty_count -= 1
+        self.toggle_hashes(point_num, side)
+        if self.candidates is not None:
+            self.add_neighbor(point_num)
+
+    def toggle_hashes(self, point_num, side):
+        """Adds or removes a piece of side at point_num from the position hashes"""
+        if self.zobrist_hash is not None:
+            self.zobrist_hash ^= self.zobrist_keys[side][point_num]
+        if self.packed_symmetry_hashes is not None:
+            self.packed_symmetry_hashes ^= self.symmetry_keys[side][point_num]
+
+    def add_neighbor(self, point_num):
+        """Updates candidates after a piece was placed at point_num"""
+        counts = self.neighbor_counts
+        candidates = self.candidates
+        candidates.discard(point_num)
+        board = self.board
+        size = self.size
+        for neighbor in self.neighbors[point_num]:
+            counts[neighbor] += 1
+            if counts[neighbor] == 1 and board[neighbor // size][neighbor % size] == 0:
+                candidates.add(neighbor)
+
+    def remove_neighbor(self, point_num):
+        """Updates candidates after the piece at point_num was removed"""
+        counts = self.neighbor_counts
+        candidates = self.candidates
+        for neighbor in self.neighbors[point_num]:
+            counts[neighbor] -= 1
+            if counts[neighbor] == 0:
+                candidates.discard(neighbor)
+        if counts[point_num] > 0:
+            candidates.add(point_num)
+
+    def get_candidates(self):
+        """
+        Returns the point_nums of the empty points within radius of a piece, in increasing order
+        An empty board gives the center point. If no empty point is near a piece, every empty point is returned
+        """
+        if self.candidates is None:
+            self.neighbor_counts, self.candidates = self.find_candidates()
+        if self.candidates:
+            return sorted(self.candidates)
+        if self.empty_count == len(self.neighbor_counts):
+            return [(self.size // 2) * self.size + self.size // 2]
+        return [y * self.size + x for y, row in enumerate(self.board) for x, value in enumerate(row) if value == 0]
+
+    @property
+    def hash(self):
+        """Zobrist hash of the position: xor of the keys of every piece on board"""
+        if self.zobrist_hash is None:
+            self.zobrist_hash = self.xor_keys(self.zobrist_keys)
+        return self.zobrist_hash
+
+    @property
+    def symmetry_hashes(self):
+        """symmetry_hashes[i] is the hash of the position transformed by symmetry i (see get_symmetries)"""
+        if self.packed_symmetry_hashes is None:
+            self.packed_symmetry_hashes = self.xor_keys(self.symmetry_keys)
+        packed = self.packed_symmetry_hashes
+        mask = (1 << 64) - 1
+        return [(packed >> (64 * i)) & mask for i in range(len(self.symmetries))]
+
+    def canonical_hash(self):
+        """Returns the hash of the position, same for all 8 symmetric positions"""
+        return min(self.symmetry_hashes)
+
+    def canonical_symmetry(self):
+        """Returns the index of the symmetry mapping this position to its canonical (minimal hash) form"""
+        hashes = self.symmetry_hashes
+        return hashes.index(min(hashes))
+
+    def canonical_moves(self):
+        """Returns moves transformed into the canonical form of the position"""
+        symmetry = self.symmetries[self.canonical_symmetry()]
+        return [symmetry[move] for move in self.moves]
+
+    def check_five_at(self, point, side):
+        """Returns whether the piece of side at point is part of five in a row"""
+        x, y = point
+        board = self.board
+        size = self.size
+        for dx, dy in line_directions:
+            count = 1
+            # Count pieces in the positive direction, then the negative direction
+            x1, y1 = x + dx, y + dy
+            while 0 <= x1 < size and 0 <= y1 < size and board[y1][x1] == side:
+                count += 1
+                x1, y1 = x1 + dx, y1 + dy
+            x1, y1 = x - dx, y - dy
+            while 0 <= x1 < size and 0 <= y1 < size and board[y1][x1] == side:
+                count += 1
+                x1, y1 = x1 - dx, y1 - dy
+            if count >= 5:
                 return True
         return False
 
@@ -57,12 +441,23 @@ class Game:
         x, y = point
         return 0 <= y < self.size and 0 <= x < self.size
 
-    def check_game_status(self):
-        """Checks the status of the game. -1: board filled. 0: nothing. 1/2: won"""
+    def check_game_status(self, full_scan=False):
+        """
+        Checks the status of the game. -1: board filled. 0: nothing. 1/2: won
+        full_scan: ignore the tracked status and scan the whole board (used for validation)
+        """
+        if not full_scan:
+            self.update_win_moves()
+            if self.win_moves[1] is not None:
+                return 1
+            if self.win_moves[2] is not None:
+                return 2
+            return -1 if self.empty_count == 0 else 0
+
         # Check win
-        if self.check_win(1):
+        if self.check_win(1, full_scan=True):
             return 1
-        if self.check_win(2):
+        if self.check_win(2, full_scan=True):
             return 2
         # Check if board is full
         is_full = True
@@ -75,8 +470,15 @@ class Game:
             return -1
         return 0
 
-    def check_win(self, side=1):
-        """Checks whether the given side has won"""
+    def check_win(self, side=1, full_scan=False):
+        """
+        Checks whether the given side has won
+        full_scan: ignore the tracked status and scan the whole board (used for validation)
+        """
+        if not full_scan:
+            self.update_win_moves()
+            return self.win_moves[side] is not None
+
         # Utility function used to check win
         # Iterates through points and checks if five in a row have value side
         # calc_point: lambda x,y,i: gets the point to check for given i
@@ -112,9 +514,7 @@ class Game:
         return y * self.size + x
 
     def point_from_num(self, point_num):
-        x = point_num % self.size
-        y = int(point_num / self.size)
-        return x, y
+        return point_num % self.size, point_num // self.size
 
     def get_current_side(self):
         """Returns the current side (1 or 2)"""
@@ -136,9 +536,16 @@ class Game:
     @staticmethod
     def load_from_str(game_str):
         """Load from saved game_str"""
-        data = game_str.split(' ')
-        if len(data) < 4:
+        if game_str.count(' ') < 3:
             return None
+        # Parsed in one call when all fields are integers and the move count matches the moves, else split
+        try:
+            values = np.fromstring(game_str, dtype=np.int64, sep=' ')
+        except ValueError:
+            values = []
+        if len(values) >= 3 and values[2] == len(values) - 3:
+            return Game.from_moves(values[3:], int(values[1]))
+        data = game_str.split(' ')
         size = int(data[1])
-        moves = [int(move_str) for move_str in data[3:]]
-        return Game(size=size, moves=moves)
+        moves = list(map(int, filter(None, data[3:])))
+        return Game.from_moves(moves, size)
@@ -0,0 +1,316 @@
+import argparse
+import hashlib
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from multiprocessing import Pool
+import numpy as np
+
+from Game import Game
+from BitBoard import BitBoard, packed_length
+from SearchBot import SearchBot
+from MCTSBot import MCTSBot
+from GameArena import bot_factories, get_bot_init
+import GameIO
+
+# Analysis of the positions of saved games by a bot, written as columns of a numpy .npz file, one row per position:
+#   game: index of the game in the corpus (after filters), ply: number of moves played before the position,
+#   side: side to move, hash: Game.hash of the position, played: move played next in the game (point_num),
+#   best: move of the bot, played_score: score of the played move, cached: row read from the cache,
+#   top_moves / top_scores: the k points with the highest scores (-1 / nan when fewer),
+#   scores (unless left out): score of every point_num, nan for occupied points,
+#   position: the pieces as BitBoard.to_bytes, restored with BitGame.from_bytes(size, row.tobytes())
+# Scores come from bots with get_scores (GameBot), other bots only give best (and nan scores)
+# Results are cached in an sqlite file keyed by bot version and position, so reruns skip analyzed positions
+
+# Sources the results of every bot depend on. Changing any of them changes the bot versions, see bot_version
+version_files = ['Game.py', 'GameBot.py', 'SearchBot.py', 'MCTSBot.py', 'ThreatSolver.py', 'BatchGame.py']
+
+cache_schema = '''
+CREATE TABLE IF NOT EXISTS positions (
+    version TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    hash INTEGER NOT NULL,
+    best INTEGER NOT NULL,
+    scores BLOB,
+    PRIMARY KEY (version, size, hash)
+)
+'''
+
+# Read only cache connections of this process by path, see get_connection
+connection_cache = {}
+
+
+def bot_version(name, time_limit):
+    """Returns the cache version of the bot with name: its settings and a digest of the bot sources"""
+    if bot_factories[name] not in [SearchBot, MCTSBot]:
+        time_limit = None  # only used by search bots, see get_bot_init
+    digest = hashlib.sha1()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for filename in version_files:
+        with open(os.path.join(directory, filename), 'rb') as f:
+            digest.update(f.read())
+    return '{}:{}:{}'.format(name, time_limit, digest.hexdigest()[:16])
+
+
+def open_cache(path):
+    """Opens the cache at path for writing, creating it if needed"""
+    connection = sqlite3.connect(path)
+    connection.execute(cache_schema)
+    connection.commit()
+    return connection
+
+
+def get_connection(path):
+    """Returns a read only connection to the cache at path, opened once per process"""
+    if path not in connection_cache:
+        connection_cache[path] = sqlite3.connect('file:{}?mode=ro'.format(path), uri=True)
+    return connection_cache[path]
+
+
+def to_signed(value):
+    """Returns the unsigned 64 bit value as signed, the range sqlite stores"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def select_plies(move_count, plies=None, every=1, skip=0):
+    """
+    Returns the plies to analyze of a game with move_count moves: plies if given, else every every-th ply
+    from skip. Only plies with a move played after them are kept
+    """
+    if plies is not None:
+        return sorted(ply for ply in set(plies) if 0 <= ply < move_count)
+    return list(range(skip, move_count, every))
+
+
+def analyze_position(bot, game):
+    """Returns (best, scores) of the bot for the game's position, scores indexed by point_num or None"""
+    if not hasattr(bot, 'get_scores'):
+        point = bot.get_next_move()
+        return (game.point_num(point) if point is not None else -1), None
+    # Scores indexed [y][x] like point_num
+    scores = bot.get_scores().T.reshape(-1).astype(np.float32)
+    scores[np.array(game.board).reshape(-1) != 0] = np.nan
+    if np.isnan(scores).all():
+        return -1, scores
+    return int(np.nanargmax(scores)), scores
+
+
+def analyze_game(task):
+    """
+    Analyzes the positions of one game
+    task: (index, record, plies, bot_init, version, cache_path)
+        plies: sorted plies to analyze, cache_path: sqlite cache read before analyzing (None: no cache)
+    Returns (index, rows, valid), rows are (ply, side, hash, played, best, scores, cached, position) and scores
+    may be None. valid is False when a move of the record can't be placed (off the board or repeated), the positions
+    from that move on are not analyzed
+    """
+    index, record, plies, bot_init, version, cache_path = task
+    connection = get_connection(cache_path) if cache_path else None
+    game = Game(size=record.size)
+    # Packed copy of the position for the output, the bots use game
+    bitboard = BitBoard(record.size)
+    rows = []
+    for ply in plies:
+        while len(game.moves) < ply:
+            point = game.point_from_num(int(record.moves[len(game.moves)]))
+            side = game.get_current_side()
+            if not game.place(point, side):
+                return index, rows, False
+            bitboard.set(point, side)
+        if game.check_game_status() != 0:
+            break
+        played = int(record.moves[ply])
+        if game.get_point(game.point_from_num(played)) != 0:
+            return index, rows, False
+
+        side = game.get_current_side()
+        cached = None
+        if connection is not None:
+            cached = connection.execute(
+                'SELECT best, scores FROM positions WHERE version = ? AND size = ? AND hash = ?',
+                (version, game.size, to_signed(game.hash))).fetchone()
+        if cached is not None:
+            best, blob = cached
+            scores = np.frombuffer(blob, dtype=np.float32) if blob is not None else None
+        else:
+            # Seeded by the position so bots choosing at random give the same move on every run
+            random.seed(game.hash)
+            best, scores = analyze_position(bot_init(game, side), game)
+        rows.append((ply, side, game.hash, played, best, scores, cached is not None, bitboard.to_bytes()))
+    return index, rows, True
+
+
+def top_moves(scores, k):
+    """Returns (moves, scores) of the k highest scores of each row of scores (nan last), -1 / nan when fewer"""
+    # Stable sort, ties are in point_num order like GameBot.get_best_points
+    order = np.argsort(-scores, axis=1, kind='mergesort')[:, :k]
+    values = scores[np.arange(len(scores)).reshape(-1, 1), order]
+    moves = np.where(np.isnan(values), -1, order)
+    return moves, values
+
+
+class ColumnWriter:
+    """
+    Writes columns of rows appended a few at a time to one .npz, holding none of them in memory
+    Rows are appended to a raw file per column in directory, then each column is memory mapped while it is
+    compressed into the .npz
+    columns: name -> (dtype, shape of a row)
+    """
+
+    def __init__(self, directory, columns):
+        self.directory = directory
+        self.columns = columns
+        self.files = {name: open(self.column_path(name), 'wb') for name in columns}
+        self.length = 0
+
+    def column_path(self, name):
+        return os.path.join(self.directory, name + '.bin')
+
+    def append(self, **values):
+        """Appends rows, values maps every column to an array of the same number of rows"""
+        for name, (dtype, shape) in self.columns.items():
+            self.files[name].write(np.ascontiguousarray(values[name], dtype=dtype).tobytes())
+        self.length += len(values[next(iter(self.columns))])
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+    def save(self, output, **arrays):
+        """Closes the column files and writes them with arrays (small values such as settings) to output"""
+        self.close()
+        for name, (dtype, shape) in self.columns.items():
+            if self.length == 0:
+                arrays[name] = np.zeros((0,) + shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(self.column_path(name), dtype=dtype, mode='r', shape=(self.length,) + shape)
+        np.savez_compressed(output, **arrays)
+
+
+def run_analysis(bot_init, version, output, path=None, size=15, plies=None, every=1, skip=0, k=5,
+                 cache_path=None, processes=None, score_map=True, **filters):
+    """
+    Analyzes the positions of the games of size in path (text or archive, default: GameIO.filename) with the bot
+    from bot_init across a process pool, writing the columns to output (.npz)
+    Rows are written to temporary files next to output as games are analyzed, so memory doesn't grow with the corpus
+    bot_init: lambda game, side: SomeBot(), must be picklable if processes != 1
+    version: cache key of the bot, see bot_version. Positions found in the cache at cache_path aren't analyzed again,
+        and new results are added to it
+    plies / every / skip: positions of each game, see select_plies
+    score_map: include the scores of every point, (positions, size * size) floats
+    Returns stats dict. Games with an invalid move (see analyze_game) are counted in invalid_games and only their
+    positions before that move are analyzed
+    """
+    point_count = size * size
+    columns = {
+        'game': (np.int32, ()),
+        'ply': (np.int16, ()),
+        'side': (np.int8, ()),
+        'hash': (np.uint64, ()),
+        'played': (np.int16, ()),
+        'best': (np.int16, ()),
+        'cached': (bool, ()),
+        'position': (np.uint8, (2 * packed_length(size),)),
+        'played_score': (np.float32, ()),
+        'top_moves': (np.int64, (k,)),
+        'top_scores': (np.float32, (k,)),
+    }
+    if score_map:
+        columns['scores'] = (np.float32, (point_count,))
+    stats = {'games': 0, 'positions': 0, 'cached': 0, 'invalid_games': 0}
+    start = time.perf_counter()
+
+    def tasks():
+        for index, game_record in enumerate(GameIO.iter_games(path, size=size, **filters)):
+            game_plies = select_plies(len(game_record.moves), plies, every, skip)
+            yield index, game_record, game_plies, bot_init, version, cache_path
+
+    def record(result):
+        index, rows, valid = result
+        stats['games'] += 1
+        stats['invalid_games'] += not valid
+        stats['positions'] += len(rows)
+        if len(rows) == 0:
+            return
+        new_rows = []
+        for ply, side, position_hash, played, best, scores, cached, position in rows:
+            if not cached:
+                new_rows.append((version, size, to_signed(position_hash), best,
+                                 scores.tobytes() if scores is not None else None))
+            stats['cached'] += cached
+        if connection is not None:
+            connection.executemany('INSERT OR REPLACE INTO positions VALUES (?, ?, ?, ?, ?)', new_rows)
+            connection.commit()
+
+        ply, side, position_hash, played, best, scores, cached, position = zip(*rows)
+        no_scores = np.full(point_count, np.nan, dtype=np.float32)
+        scores = np.array([no_scores if row is None else row for row in scores], dtype=np.float32)
+        played = np.array(played, dtype=np.int16)
+        values = dict(game=np.full(len(rows), index), ply=ply, side=side, hash=np.array(position_hash, dtype=np.uint64),
+                      played=played, best=best, cached=cached,
+                      position=np.frombuffer(b''.join(position), dtype=np.uint8).reshape(len(rows), -1),
+                      played_score=scores[np.arange(len(rows)), played], scores=scores)
+        values['top_moves'], values['top_scores'] = top_moves(scores, k)
+        writer.append(**values)
+
+    connection = open_cache(cache_path) if cache_path else None
+    directory = tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output)))
+    writer = ColumnWriter(directory.name, columns)
+    try:
+        if processes == 1:
+            for task in tasks():
+                record(analyze_game(task))
+        else:
+            with Pool(processes) as pool:
+                # In order, so the output doesn't depend on scheduling
+                for result in pool.imap(analyze_game, tasks(), chunksize=4):
+                    record(result)
+        writer.save(output, size=size, version=version)
+    finally:
+        writer.close()
+        directory.cleanup()
+        if connection is not None:
+            connection.close()
+
+    stats['time'] = time.perf_counter() - start
+    stats['positions_per_second'] = stats['positions'] / stats['time'] if stats['time'] > 0 else 0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyzes positions of saved games with a bot')
+    parser.add_argument('output', help='.npz file of the results')
+    parser.add_argument('--input', default=None, help='text or archive file, default: ' + GameIO.filename)
+    parser.add_argument('--size', type=int, default=15, help='only games of this board size are analyzed')
+    parser.add_argument('--bot', default='GameBot', choices=sorted(bot_factories))
+    parser.add_argument('--time-limit', type=float, default=0.5, help='seconds per move for search bots')
+    parser.add_argument('--version', default=None, help='cache version of the bot, default: from its sources')
+    parser.add_argument('--plies', type=int, nargs='+', default=None, help='plies to analyze, default: all')
+    parser.add_argument('--every', type=int, default=1, help='analyze every this many plies')
+    parser.add_argument('--skip', type=int, default=0, help='first ply analyzed')
+    parser.add_argument('--top', type=int, default=5, help='number of top moves kept per position')
+    parser.add_argument('--cache', default='analysis_cache.sqlite', help='sqlite cache file, "" to disable')
+    parser.add_argument('--processes', type=int, default=None, help='default: number of cores')
+    parser.add_argument('--no-score-map', action='store_true', help='leave out the scores of every point')
+    parser.add_argument('--result', type=int, default=None, choices=[0, 1, 2], help='only games with this result')
+    parser.add_argument('--min-moves', type=int, default=None)
+    parser.add_argument('--max-moves', type=int, default=None)
+    args = parser.parse_args()
+
+    version = args.version or bot_version(args.bot, args.time_limit)
+    stats = run_analysis(get_bot_init(args.bot, args.time_limit), version, args.output, path=args.input,
+                         size=args.size, plies=args.plies, every=args.every, skip=args.skip, k=args.top,
+                         cache_path=args.cache or None, processes=args.processes,
+                         score_map=not args.no_score_map, result=args.result, min_moves=args.min_moves,
+                         max_moves=args.max_moves)
+    print('{} games, {} positions ({} cached) in {:.1f}s, {:.1f} positions/s'.format(
+        stats['games'], stats['positions'], stats['cached'], stats['time'], stats['positions_per_second']))
+    if stats['invalid_games']:
+        print('{} games with invalid moves were analyzed up to the invalid move'.format(stats['invalid_games']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import struct
+import numpy as np
+
+from Game import Game, candidate_radius
+import GameIO
+
+# Binary archive of games, for datasets too large for the text format of GameIO
+# Layout (little endian):
+#   header: magic (4 bytes), version (u16), reserved (u16), game count (u64), index offset (u64), reserved (u64)
+#   records, one per game: size (u8), result (i8), move count (u16), moves as point numbers (u16 * move count)
+#   index at index offset (8 byte aligned): offset of each record (u64 * game count)
+magic = b'C5GA'
+version = 1
+header_format = '<4sHHQQQ'
+header_size = struct.calcsize(header_format)
+record_format = '<BbH'
+record_header_size = struct.calcsize(record_format)
+
+
+class GameArchiveWriter:
+    """Writes games into a new binary archive. The index is written on close"""
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(bytes(header_size))  # header is written on close
+        self.offsets = []
+        self.position = header_size
+
+    def add(self, size, result, moves):
+        """Adds a game from its size, result (0/1/2 like game_str) and moves (point numbers)"""
+        moves = np.asarray(moves, dtype='<u2')
+        self.offsets.append(self.position)
+        self.file.write(struct.pack(record_format, size, result, len(moves)))
+        self.file.write(moves.tobytes())
+        self.position += record_header_size + moves.nbytes
+
+    def add_game(self, game):
+        result = 1 if game.check_win(1) else 2 if game.check_win(2) else 0
+        self.add(game.size, result, game.moves)
+
+    def add_str(self, game_str):
+        """Adds a game saved as game_str (see Game.game_str)"""
+        data = game_str.split(' ')
+        if len(data) < 4:
+            return
+        self.add(int(data[1]), int(data[0]), [int(move_str) for move_str in data[3:] if move_str])
+
+    def close(self):
+        # Pad so the index is 8 byte aligned
+        padding = -self.position % 8
+        self.file.write(bytes(padding))
+        index_offset = self.position + padding
+        self.file.write(np.array(self.offsets, dtype='<u8').tobytes())
+        self.file.seek(0)
+        self.file.write(struct.pack(header_format, magic, version, 0, len(self.offsets), index_offset, 0))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class GameArchive:
+    """Reads a binary archive through a memory map. Game k is found through the index without scanning"""
+
+    def __init__(self, path):
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        file_magic, file_version, _, count, index_offset, _ = struct.unpack(
+            header_format, self.data[:header_size].tobytes())
+        if file_magic != magic or file_version != version:
+            raise ValueError('Not a game archive: ' + str(path))
+        self.offsets = self.data[index_offset:index_offset + 8 * count].view('<u8')
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, k):
+        """Returns (size, result, moves) of game k. moves is a read-only view into the file"""
+        offset = int(self.offsets[k])
+        size, result, count = struct.unpack(
+            record_format, self.data[offset:offset + record_header_size].tobytes())
+        start = offset + record_header_size
+        return size, result, self.data[start:start + 2 * count].view('<u2')
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+    def get_moves(self, k):
+        """Returns the moves of game k as a read-only uint16 view"""
+        return self[k][2]
+
+    def get_game(self, k, ply=None, radius=candidate_radius):
+        """Returns game k as a Game, at the position after the first ply moves (default: all), see Game.from_moves"""
+        size, _, moves = self[k]
+        return Game.from_moves(moves, size, ply, radius)
+
+    def get_game_str(self, k):
+        """Returns game k in the text format of Game.game_str"""
+        size, result, moves = self[k]
+        moves_str = ' '.join(str(move) for move in moves.tolist())
+        return ' '.join([str(result), str(size), str(len(moves)), moves_str])
+
+
+def text_to_archive(archive_path, text_path=None):
+    """Converts a text file of game_str (default: GameIO.filename) into an archive. Returns the game count"""
+    with GameArchiveWriter(archive_path) as writer:
+        with open(text_path or GameIO.filename, 'r') as f:
+            for line in f:
+                writer.add_str(line.rstrip('\n'))
+        return len(writer.offsets)
+
+
+def archive_to_text(archive_path, text_path=None):
+    """Appends every game of an archive to a text file of game_str (default: GameIO.filename)"""
+    archive = GameArchive(archive_path)
+    with open(text_path or GameIO.filename, 'a') as f:
+        for k in range(len(archive)):
+            f.write(archive.get_game_str(k) + '\n')
+    return len(archive)
@@ -0,0 +1,185 @@
+import argparse
+import functools
+import random
+import time
+from multiprocessing import Pool
+
+from Game import Game
+from GameBot import GameBot
+from SearchBot import SearchBot
+from MCTSBot import MCTSBot
+from EvalCache import get_shared_cache
+from OpeningBook import get_book
+from GameProfiler import profiler, Profiler, CProfileCapture
+import GameIO
+
+
+def cached_game_bot(game, side, book=None):
+    """GameBot using the EvalCache shared by all games played in this process"""
+    return GameBot(game, side, cache=get_shared_cache(), book=book)
+
+
+def book_bot(bot_init, book_path, game, side):
+    """Bot from bot_init using the opening book at book_path, opened once in each process"""
+    return bot_init(game, side, book=get_book(book_path))
+
+
+# Bots available from the command line, by name
+bot_factories = {
+    'GameBot': GameBot,
+    'CachedGameBot': cached_game_bot,
+    'SearchBot': SearchBot,
+    'MCTSBot': MCTSBot,
+}
+
+
+def random_opening(game, count, rng):
+    """Places count random moves near the center of the board, alternating sides"""
+    center = game.size // 2
+    radius = min(3, center)
+    for _ in range(count):
+        point = None
+        while point is None or game.get_point(point) != 0:
+            point = (rng.randint(center - radius, center + radius), rng.randint(center - radius, center + radius))
+        game.place(point, game.get_current_side())
+
+
+def play_moves(game, bots):
+    """Plays the bots against each other until the game is finished. Returns the status"""
+    status = game.check_game_status()
+    while status == 0:
+        side = game.get_current_side()
+        point = bots[side].get_next_move()
+        if point is None or not game.place(point, side):
+            # Bot failed to make a legal move - forfeits
+            return 3 - side
+        for bot in bots.values():
+            bot.new_move(point, side)
+        status = game.check_game_status()
+    return status
+
+
+def play_game(task):
+    """
+    Plays one game between two bots
+    task: (index, bot1_init, bot2_init, size, seed, opening_moves, profile, cprofile_path)
+        bot1 plays side 1 in even games and side 2 in odd games
+        profile: time bot and game functions with GameProfiler.profiler
+        cprofile_path: if given, game 0 is run under cProfile and its stats are written there
+    Returns (index, game_str, bot1_side, status, timings), timings is Profiler.to_dict() or None
+    """
+    index, bot1_init, bot2_init, size, seed, opening_moves, profile, cprofile_path = task
+    # Seed the global random used by bots, and use a separate one for the opening
+    random.seed(seed)
+    game = Game(size=size)
+    random_opening(game, opening_moves, random.Random(seed))
+
+    bot1_side = 1 if index % 2 == 0 else 2
+    if profile:
+        profiler.reset()
+        profiler.enable()
+    try:
+        bots = {
+            bot1_side: bot1_init(game, bot1_side),
+            3 - bot1_side: bot2_init(game, 3 - bot1_side),
+        }
+        if cprofile_path and index == 0:
+            with CProfileCapture(cprofile_path):
+                status = play_moves(game, bots)
+        else:
+            status = play_moves(game, bots)
+    finally:
+        if profile:
+            profiler.disable()
+    return index, game.game_str(), bot1_side, status, profiler.to_dict() if profile else None
+
+
+def run_arena(bot1_init, bot2_init, games, size=15, processes=None, seed=0, opening_moves=2,
+              path=None, save=True, profile=False, cprofile_path=None):
+    """
+    Plays games between bot1 and bot2 across a process pool, alternating sides
+    bot1_init / bot2_init: lambda game, side: SomeBot(), must be picklable if processes != 1
+    Each game is saved through GameIO (to path) as soon as it finishes
+    profile: time bot and game functions in every game, merged into stats['profile'] (see GameProfiler)
+    cprofile_path: write cProfile stats of the first game to this file
+    Returns stats dict, with wins / draws / losses from the perspective of bot1
+    """
+    tasks = [(i, bot1_init, bot2_init, size, seed + i, opening_moves, profile, cprofile_path)
+             for i in range(games)]
+    stats = {'games': 0, 'wins': 0, 'draws': 0, 'losses': 0, 'moves': 0}
+    timings = Profiler()
+    start = time.perf_counter()
+
+    def record(result):
+        index, game_str, bot1_side, status, game_timings = result
+        if game_timings is not None:
+            timings.merge(game_timings)
+        if save:
+            GameIO.save_game(game_str, path)
+        stats['games'] += 1
+        stats['moves'] += int(game_str.split(' ')[2])
+        if status == bot1_side:
+            stats['wins'] += 1
+        elif status == 3 - bot1_side:
+            stats['losses'] += 1
+        else:
+            stats['draws'] += 1
+
+    if processes == 1:
+        for task in tasks:
+            record(play_game(task))
+    else:
+        with Pool(processes) as pool:
+            for result in pool.imap_unordered(play_game, tasks):
+                record(result)
+
+    stats['time'] = time.perf_counter() - start
+    stats['games_per_second'] = stats['games'] / stats['time'] if stats['time'] > 0 else 0
+    if profile:
+        stats['profile'] = timings
+    return stats
+
+
+def get_bot_init(name, time_limit, book_path=None):
+    """Returns a picklable bot_init for the bot with name, using the opening book at book_path if given"""
+    factory = bot_factories[name]
+    if factory in [SearchBot, MCTSBot]:
+        factory = functools.partial(factory, time_limit=time_limit)
+    if book_path:
+        return functools.partial(book_bot, factory, book_path)
+    return factory
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Plays games between two bots and saves them through GameIO')
+    parser.add_argument('--bot1', default='GameBot', choices=sorted(bot_factories))
+    parser.add_argument('--bot2', default='GameBot', choices=sorted(bot_factories))
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--size', type=int, default=15)
+    parser.add_argument('--processes', type=int, default=None, help='default: number of cores')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--opening-moves', type=int, default=2, help='random moves played before the bots')
+    parser.add_argument('--time-limit', type=float, default=0.5, help='seconds per move for search bots')
+    parser.add_argument('--book', default=None, help='opening book used by both bots, see OpeningBook')
+    parser.add_argument('--output', default=None, help='default: ' + GameIO.filename)
+    parser.add_argument('--no-save', action='store_true')
+    parser.add_argument('--profile', default=None, help='write timings of bot and game functions as JSON to this file')
+    parser.add_argument('--cprofile', default=None, help='write cProfile stats of the first game to this file')
+    args = parser.parse_args()
+
+    stats = run_arena(get_bot_init(args.bot1, args.time_limit, args.book),
+                      get_bot_init(args.bot2, args.time_limit, args.book),
+                      args.games, size=args.size, processes=args.processes, seed=args.seed,
+                      opening_moves=args.opening_moves, path=args.output, save=not args.no_save,
+                      profile=args.profile is not None, cprofile_path=args.cprofile)
+    print('{} vs {}: {} games, {} wins, {} draws, {} losses'.format(
+        args.bot1, args.bot2, stats['games'], stats['wins'], stats['draws'], stats['losses']))
+    print('{:.1f}s, {:.2f} games/s, {:.1f} moves/game'.format(
+        stats['time'], stats['games_per_second'], stats['moves'] / max(stats['games'], 1)))
+    if args.profile:
+        stats['profile'].dump(args.profile)
+        print(stats['profile'].summary())
+
+
+if __name__ == '__main__':
+    main()
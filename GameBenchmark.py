@@ -0,0 +1,262 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+
+from Game import Game
+from GameBot import GameBot
+import GameIO
+
+# Sizes benchmarked by default
+default_sizes = [9, 15, 19]
+
+# Results slower than the baseline by more than this fraction are regressions in compare mode
+default_threshold = 0.1
+
+
+def random_game(size, rng, max_moves=None):
+    """Returns a Game played with random moves near existing pieces until it is finished (or max_moves)"""
+    game = Game(size=size)
+    while game.check_game_status() == 0 and (max_moves is None or len(game.moves) < max_moves):
+        game.place(game.point_from_num(rng.choice(game.get_candidates())), game.get_current_side())
+    return game
+
+
+def random_corpus(size, count, seed=0):
+    """Returns count game_str of random finished games, see random_game"""
+    rng = random.Random(seed)
+    return [random_game(size, rng).game_str() for _ in range(count)]
+
+
+def timed(setup, run, ops, repeat):
+    """
+    Times run(setup()) repeat times, with setup outside of the timing
+    Returns a result dict with the best time of the repeats per op (one of ops operations done by each run)
+    """
+    times = []
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    return {
+        'ops': ops,
+        'repeat': repeat,
+        'seconds_per_op': best / ops,
+        'ops_per_second': ops / best if best > 0 else 0,
+        'median_seconds_per_op': sorted(times)[len(times) // 2] / ops,
+    }
+
+
+def bench_game(size, repeat):
+    """Game.place, check_win and check_game_status over whole random games"""
+    corpus = [Game.load_from_str(game_str).moves for game_str in random_corpus(size, 20, seed=size)]
+    move_count = sum(len(moves) for moves in corpus)
+
+    def place(state):
+        for game, moves in state:
+            for move in moves:
+                game.place(game.point_from_num(move), game.get_current_side())
+
+    def check(state, full_scan=False):
+        for game, _ in state:
+            for _ in range(100):
+                game.check_win(1, full_scan)
+                game.check_game_status(full_scan)
+
+    def empty_games():
+        return [(Game(size=size), moves) for moves in corpus]
+
+    def full_games():
+        return [(Game(size=size, moves=moves), moves) for moves in corpus]
+
+    return {
+        'game.place': timed(empty_games, place, move_count, repeat),
+        'game.check': timed(full_games, check, 100 * len(corpus), repeat),
+        'game.check_full_scan': timed(full_games, lambda state: check(state, True), 100 * len(corpus), repeat),
+    }
+
+
+def bench_game_bot(size, repeat):
+    """GameBot construction, cloning, new_move and get_next_move at different phases of the game"""
+    rng = random.Random(size)
+    # Positions of each phase, by the fraction of the board filled
+    phases = {'opening': 4, 'middle': size * size // 8, 'late': size * size // 4}
+    results = {}
+    for phase, move_count in phases.items():
+        games = [random_game(size, rng, max_moves=move_count) for _ in range(5)]
+        games = [game for game in games if game.check_game_status() == 0]
+        if not games:
+            continue
+
+        def init(state):
+            for game in state:
+                GameBot(game, game.get_current_side())
+
+        def clone(state):
+            for bot in state:
+                GameBot.from_bot(bot)
+
+        def next_move(state):
+            for bot in state:
+                bot.get_next_move()
+
+        results['gamebot.init[{}]'.format(phase)] = timed(lambda: games, init, len(games), repeat)
+        results['gamebot.from_bot[{}]'.format(phase)] = timed(
+            lambda: [GameBot(game, game.get_current_side()) for game in games], clone, len(games), repeat)
+        results['gamebot.get_next_move[{}]'.format(phase)] = timed(
+            lambda: [GameBot(game, game.get_current_side()) for game in games], next_move, len(games), repeat)
+
+    corpus = [Game.load_from_str(game_str) for game_str in random_corpus(size, 10, seed=size)]
+    move_count = sum(len(game.moves) for game in corpus)
+
+    def new_move(state):
+        for game, bot in state:
+            side = 1
+            for move in game.moves:
+                bot.new_move(game.point_from_num(move), side)
+                side = 3 - side
+
+    results['gamebot.new_move'] = timed(lambda: [(game, GameBot(Game(size=size), 1)) for game in corpus],
+                                        new_move, move_count, repeat)
+    return results
+
+
+def bench_io(size, repeat):
+    """Game.load_from_str, and GameIO save / load throughput on a generated corpus, in games"""
+    corpus = random_corpus(size, 200, seed=size)
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'games.txt')
+    try:
+        def save(state):
+            if os.path.exists(path):
+                os.remove(path)
+            for game_str in corpus:
+                GameIO.save_game(game_str, path)
+
+        def load(state):
+            for game_str in GameIO.load_games(path):
+                Game.load_from_str(game_str)
+
+        def iterate(state):
+            for _ in GameIO.iter_games(path):
+                pass
+
+        def parse(state):
+            for game_str in corpus:
+                Game.load_from_str(game_str)
+
+        return {
+            'game.load_from_str': timed(lambda: None, parse, len(corpus), repeat),
+            'gameio.save_game': timed(lambda: None, save, len(corpus), repeat),
+            'gameio.load_games': timed(lambda: None, load, len(corpus), repeat),
+            'gameio.iter_games': timed(lambda: None, iterate, len(corpus), repeat),
+        }
+    finally:
+        shutil.rmtree(directory)
+
+
+# Benchmark groups by name, each returning {benchmark name: result} for a board size
+benchmark_groups = {
+    'game': bench_game,
+    'gamebot': bench_game_bot,
+    'io': bench_io,
+}
+
+
+def machine_info():
+    """Returns a dict describing the machine and environment, stored with the results"""
+    return {
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+    }
+
+
+def run_benchmarks(sizes=None, groups=None, repeat=5, seed=0):
+    """
+    Runs the benchmark groups (default: all) for every board size (default: default_sizes)
+    Returns a dict with machine info and results keyed 'name[size=N]'
+    """
+    random.seed(seed)
+    results = {}
+    for size in sizes or default_sizes:
+        for group in groups or sorted(benchmark_groups):
+            for name, result in benchmark_groups[group](size, repeat).items():
+                results['{}[size={}]'.format(name, size)] = result
+    return {'machine': machine_info(), 'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'results': results}
+
+
+def compare(results, baseline, threshold=default_threshold):
+    """
+    Compares results to baseline (both from run_benchmarks)
+    Returns a list of (name, baseline seconds per op, seconds per op, ratio) for every benchmark in both,
+    and the names of the regressions: benchmarks slower than baseline by more than threshold
+    """
+    rows = []
+    regressions = []
+    for name, result in sorted(results['results'].items()):
+        if name not in baseline['results']:
+            continue
+        before = baseline['results'][name]['seconds_per_op']
+        after = result['seconds_per_op']
+        ratio = after / before if before > 0 else 1
+        rows.append((name, before, after, ratio))
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def format_time(seconds):
+    for unit, scale in [('s', 1), ('ms', 1e-3), ('us', 1e-6)]:
+        if seconds >= scale:
+            return '{:.2f}{}'.format(seconds / scale, unit)
+    return '{:.0f}ns'.format(seconds / 1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks Game, GameBot and GameIO hot paths')
+    parser.add_argument('--sizes', type=int, nargs='+', default=default_sizes)
+    parser.add_argument('--groups', nargs='+', default=None, choices=sorted(benchmark_groups),
+                        help='default: all')
+    parser.add_argument('--repeat', type=int, default=5, help='best of this many runs is kept')
+    parser.add_argument('--output', default=None, help='write results as JSON to this file')
+    parser.add_argument('--compare', default=None, help='baseline JSON from --output to compare against')
+    parser.add_argument('--threshold', type=float, default=default_threshold,
+                        help='slowdown (fraction) counted as a regression')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.groups, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if not args.compare:
+        for name, result in sorted(results['results'].items()):
+            print('{:<48} {:>10}/op {:>12.0f} ops/s'.format(
+                name, format_time(result['seconds_per_op']), result['ops_per_second']))
+        return
+
+    with open(args.compare, 'r') as f:
+        baseline = json.load(f)
+    rows, regressions = compare(results, baseline, args.threshold)
+    for name, before, after, ratio in rows:
+        flag = '  REGRESSION' if name in regressions else ''
+        print('{:<48} {:>10} -> {:>10} {:>6.2f}x{}'.format(name, format_time(before), format_time(after), ratio, flag))
+    print('{} of {} benchmarks regressed by more than {:.0%}'.format(len(regressions), len(rows), args.threshold))
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
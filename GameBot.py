@@ -1,16 +1,222 @@
 import random
 import math
+import sys
 import numpy as np
 
 from Game import Game
 
+# Score of a point for each win / lose condition it is part of, indexed by condition value + 1
+win_scores = [0, 10, 50, 200, 1000, math.inf]
+lose_scores = [0, 10, 50, 200, 1000, 10000]
+win_score_table = np.array(win_scores, dtype=float)
+lose_score_table = np.array(lose_scores, dtype=float)
+
+# Approximate bytes of each (x, y) of the best points cached in an EvalCache: the tuple only, since
+#   coordinates are small ints shared by the interpreter
+cached_point_bytes = sys.getsizeof((0, 0))
+
+# Step (dx, dy) from a condition's (x, y) to the next of its 5 points, for each orientation
+condition_steps = ((1, 0), (1, 1), (0, 1), (-1, 1))
+
+# Affected condition index for each board size, see get_affected_index
+affected_index_cache = {}
+
+# Padded affected condition matrix for each board size, see get_affected_matrix
+affected_matrix_cache = {}
+
+# Points of every condition for each board size, see get_condition_points
+condition_points_cache = {}
+
+# Reachable condition mask for each board size, see get_reachable_conditions
+reachable_cache = {}
+
+# Conditions of an empty board for each board size, see get_empty_conditions
+empty_conditions_cache = {}
+
+
+def affected_conditions(size, point):
+    """Returns an array of the win conditions (x, y, n) affected by point on a board of size"""
+    x, y = point
+    affected = []
+
+    # Min / max offset available for x, y
+    x_min_offset = max(0, 5 - (size - x))
+    x_max_offset = min(4, x)
+    y_min_offset = max(0, 5 - (size - y))
+    y_max_offset = min(4, y)
+
+    # Horizontal
+    for offset in range(x_min_offset, x_max_offset + 1):
+        affected.append((x - offset, y, 0))
+    # South East
+    for offset in range(max(x_min_offset, y_min_offset), min(x_max_offset, y_max_offset) + 1):
+        affected.append((x - offset, y - offset, 1))
+    # Vertical
+    for offset in range(y_min_offset, y_max_offset + 1):
+        affected.append((x, y - offset, 2))
+    # South West
+    for offset in range(max(4 - x_max_offset, y_min_offset), min(4 - x_min_offset, y_max_offset) + 1):
+        affected.append((x + offset, y - offset, 3))
+    return affected
+
+
+def get_affected_index(size):
+    """
+    Returns (offsets, indices) of the conditions affected by every point, in CSR layout
+    indices are into the flattened (size, size, 4) conditions. The conditions affected by point number
+    p = y * size + x are indices[offsets[p]:offsets[p + 1]]
+    Built once per board size and shared by all bots
+    """
+    if size not in affected_index_cache:
+        offsets = [0]
+        indices = []
+        for point_num in range(size * size):
+            point = point_num % size, point_num // size
+            for x, y, n in affected_conditions(size, point):
+                indices.append((x * size + y) * 4 + n)
+            offsets.append(len(indices))
+        affected_index_cache[size] = np.array(offsets), np.array(indices)
+    return affected_index_cache[size]
+
+
+def get_affected_matrix(size):
+    """
+    Returns an array (size * size, 20) of the conditions affected by every point number, as indices into the
+    flattened (size, size, 4) conditions. Points affected by fewer than 20 conditions are padded with
+    size * size * 4, one past the last condition
+    """
+    if size not in affected_matrix_cache:
+        offsets, indices = get_affected_index(size)
+        matrix = np.full((size * size, 20), size * size * 4, dtype=int)
+        for point_num in range(size * size):
+            start, end = offsets[point_num], offsets[point_num + 1]
+            matrix[point_num, :end - start] = indices[start:end]
+        affected_matrix_cache[size] = matrix
+    return affected_matrix_cache[size]
+
+
+def get_condition_points(size):
+    """
+    Returns an array (size * size * 4, 5) of the point numbers in each condition, indexed by flattened condition
+    Conditions that go off the board have -1 for their points off the board
+    Built once per board size and shared by all bots
+    """
+    if size not in condition_points_cache:
+        x = np.arange(size).reshape(size, 1, 1, 1)
+        y = np.arange(size).reshape(1, size, 1, 1)
+        steps = np.array(condition_steps).reshape(1, 1, 4, 2, 1)
+        i = np.arange(5).reshape(1, 1, 1, 5)
+        point_x = x + steps[..., 0, :] * i
+        point_y = y + steps[..., 1, :] * i
+        on_board = (0 <= point_x) & (point_x < size) & (0 <= point_y) & (point_y < size)
+        condition_points_cache[size] = np.where(on_board, point_y * size + point_x, -1).reshape(-1, 5)
+    return condition_points_cache[size]
+
+
+def score_conditions(win_conditions, lose_conditions):
+    """
+    Returns scores of all points for the given conditions as an array indexed [x][y]
+    Conditions may have leading batch dimensions (..., size, size, 4), giving scores (..., size, size)
+    """
+    size = win_conditions.shape[-2]
+    # Score each condition adds to its 5 points, with orientation as the first axis
+    condition_scores = win_score_table[win_conditions + 1] + lose_score_table[lose_conditions + 1]
+    condition_scores = np.ascontiguousarray(np.moveaxis(condition_scores, -1, 0))
+
+    # Add each orientation's condition scores onto the points they cover, shifted by step * i
+    # Scores are padded by 4 on each side so shifted conditions stay in bounds
+    scores = np.zeros(win_conditions.shape[:-3] + (size + 8, size + 8))
+    for n, (dx, dy) in enumerate(condition_steps):
+        for i in range(5):
+            x = 4 + dx * i
+            y = 4 + dy * i
+            scores[..., x:x + size, y:y + size] += condition_scores[n]
+    return scores[..., 4:size + 4, 4:size + 4]
+
+
+def score_points(win_conditions, lose_conditions, point_nums):
+    """
+    Returns scores of only the given point numbers, same as score_conditions at those points
+    Much cheaper than score_conditions when there are few points, e.g. the candidates of Game.get_candidates
+    """
+    size = win_conditions.shape[0]
+    condition_scores = (win_score_table[win_conditions.reshape(-1) + 1] +
+                        lose_score_table[lose_conditions.reshape(-1) + 1])
+    # The padding index of get_affected_matrix adds 0
+    condition_scores = np.append(condition_scores, 0)
+    return condition_scores[get_affected_matrix(size)[point_nums]].sum(axis=1)
+
+
+def board_conditions(boards, side):
+    """
+    Returns (win_conditions, lose_conditions) of side for a board indexed [y][x], same as GameBot tracks
+    boards may have leading batch dimensions (..., size, size), giving conditions (..., size, size, 4)
+    """
+    boards = np.asarray(boards)
+    size = boards.shape[-1]
+
+    # Planes of the pieces of side and of the other side, indexed [x][y] and padded by 4 on each side so
+    #   shifted windows stay in bounds. Both sides are summed together
+    planes = np.zeros((2,) + boards.shape[:-2] + (size + 8, size + 8), dtype=np.int8)
+    planes[0, ..., 4:size + 4, 4:size + 4] = np.swapaxes(boards == side, -1, -2)
+    planes[1, ..., 4:size + 4, 4:size + 4] = np.swapaxes(boards == 3 - side, -1, -2)
+
+    # Count pieces of each side in the 5 points of every condition, one orientation at a time
+    counts = []
+    for dx, dy in condition_steps:
+        count = planes[..., 4:size + 4, 4:size + 4].copy()
+        for i in range(1, 5):
+            x = 4 + dx * i
+            y = 4 + dy * i
+            count += planes[..., x:x + size, y:y + size]
+        counts.append(count)
+    own_counts, opponent_counts = np.stack(counts, axis=-1)
+
+    # Conditions that go off the board, or contain pieces of the other side, are -1
+    reachable = get_reachable_conditions(size)
+    win_conditions = np.where(reachable & (opponent_counts == 0), own_counts, -1)
+    lose_conditions = np.where(reachable & (own_counts == 0), opponent_counts, -1)
+    return win_conditions, lose_conditions
+
+
+def get_reachable_conditions(size):
+    """Returns a bool array (size, size, 4) of the conditions whose 5 points are all on the board. Read only"""
+    if size not in reachable_cache:
+        x = np.arange(size).reshape(size, 1)
+        y = np.arange(size).reshape(1, size)
+        reachable = np.zeros((size, size, 4), dtype=bool)
+        for n, (dx, dy) in enumerate(condition_steps):
+            end_x = x + 4 * dx
+            end_y = y + 4 * dy
+            reachable[:, :, n] = (0 <= end_x) & (end_x < size) & (0 <= end_y) & (end_y < size)
+        reachable.setflags(write=False)
+        reachable_cache[size] = reachable
+    return reachable_cache[size]
+
+
+def get_empty_conditions(size):
+    """Returns the conditions (size, size, 4) of an empty board: 0, or -1 off the edge. Read only, copy to use"""
+    if size not in empty_conditions_cache:
+        conditions = np.where(get_reachable_conditions(size), 0, -1).astype(int)
+        conditions.setflags(write=False)
+        empty_conditions_cache[size] = conditions
+    return empty_conditions_cache[size]
+
 
 class GameBot:
     """Simple AI for Connect5. Moves are entirely dependent on current state of the board"""
 
-    def __init__(self, game, side):
+    def __init__(self, game, side, cache=None, book=None, candidates=False):
+        """
+        cache: EvalCache for best points, keyed by position hash and candidate radius. Can be shared between bots
+        book: OpeningBook queried before scoring the board
+        candidates: only score the points near pieces (Game.get_candidates) instead of the whole board
+        """
         self.game = game
         self.side = side
+        self.cache = cache
+        self.book = book
+        self.candidates = candidates
 
         # Init win conditions
         # Each individual element in win_conditions represents number of pieces of side occupied for
@@ -19,125 +225,155 @@ class GameBot:
         # To access win conditions for (x, y), use win_conditions[x][y][n]
         #   where n is the orientation (0 ~ 3)
         # Orientations: 0 - horizontal, 1 - SE, 2 - vertical, 3 - SW
-        shape = game.size, game.size, 4  # 4 different orientations
-        self.win_conditions = np.zeros(shape, dtype=int)
-        self.lose_conditions = np.zeros(shape, dtype=int)  # for opponent
+        self.win_conditions = None
+        self.lose_conditions = None  # for opponent
+        # Previous values of the conditions changed by each move, used to undo moves
+        # Pieces already on the board when the bot is created can't be undone
+        self.history = []
         self.init_conditions()
 
+    @classmethod
+    def from_bot(cls, bot, game=None, side=None):
+        """
+        Returns a copy of bot for game (default: bot.game, which must be in the same position) playing side
+        (default: bot.side). Conditions are copied from bot instead of computed from the board
+        """
+        clone = cls.__new__(cls)
+        clone.__dict__.update(bot.__dict__)
+        clone.game = bot.game if game is None else game
+        clone.side = bot.side if side is None else side
+        win_conditions, lose_conditions = bot.win_conditions, bot.lose_conditions
+        if clone.side != bot.side:
+            win_conditions, lose_conditions = lose_conditions, win_conditions
+        clone.win_conditions = win_conditions.copy()
+        clone.lose_conditions = lose_conditions.copy()
+        clone.history = []
+        return clone
+
     def init_conditions(self):
-        # Set all unreachable conditions (on edge) to -1
-        for x in range(self.game.size - 4, self.game.size):
-            for y in range(self.game.size):
-                self.win_conditions[x][y][0] = -1
-                self.win_conditions[x][y][1] = -1
-                self.lose_conditions[x][y][0] = -1
-                self.lose_conditions[x][y][1] = -1
-
-        for y in range(self.game.size - 4, self.game.size):
-            for x in range(self.game.size):
-                self.win_conditions[x][y][1] = -1
-                self.win_conditions[x][y][2] = -1
-                self.win_conditions[x][y][3] = -1
-                self.lose_conditions[x][y][1] = -1
-                self.lose_conditions[x][y][2] = -1
-                self.lose_conditions[x][y][3] = -1
-
-        for x in range(4):
-            for y in range(self.game.size):
-                self.win_conditions[x][y][3] = -1
-                self.lose_conditions[x][y][3] = -1
-
-        # Set up conditions for existing moves on board
-        if len(self.game.moves) == 0:
-            # No moves are currently on board
+        """Sets the conditions from the pieces on the board"""
+        size = self.game.size
+        if self.game.empty_count == size * size:
+            # Only the conditions off the edge are -1
+            self.win_conditions = get_empty_conditions(size).copy()
+            self.lose_conditions = get_empty_conditions(size).copy()
             return
-        for y in range(self.game.size):
-            for x in range(self.game.size):
-                value = self.game.get_point((x, y))
-                if value == 0:
-                    continue
-                elif value == self.side:
-                    # Increment all conditions affected by this move by 1, and set lose to -1
-                    for x1, y1, n in self.get_affected_conditions((x, y)):
-                        if self.win_conditions[x1][y1][n] != -1:
-                            self.win_conditions[x1][y1][n] += 1
-                        self.lose_conditions[x1][y1][n] = -1
-                else:
-                    # Set all conditions affected to -1, and increment lose condition
-                    for x1, y1, n in self.get_affected_conditions((x, y)):
-                        self.win_conditions[x1][y1][n] = -1
-                        if self.lose_conditions[x1][y1][n] != -1:
-                            self.lose_conditions[x1][y1][n] += 1
+        win_conditions, lose_conditions = board_conditions(self.game.board, self.side)
+        self.win_conditions = win_conditions.astype(int)
+        self.lose_conditions = lose_conditions.astype(int)
 
     def get_affected_conditions(self, point):
         """Returns an array of the win conditions (x, y, n) affected by point"""
-        x, y = point
-        affected = []
-
-        # Min / max offset available for x, y
-        x_min_offset = max(0, 5 - (self.game.size - x))
-        x_max_offset = min(4, x)
-        y_min_offset = max(0, 5 - (self.game.size - y))
-        y_max_offset = min(4, y)
-
-        # Horizontal
-        for offset in range(x_min_offset, x_max_offset + 1):
-            affected.append((x - offset, y, 0))
-        # South East
-        for offset in range(max(x_min_offset, y_min_offset), min(x_max_offset, y_max_offset) + 1):
-            affected.append((x - offset, y - offset, 1))
-        # Vertical
-        for offset in range(y_min_offset, y_max_offset + 1):
-            affected.append((x, y - offset, 2))
-        # South West
-        for offset in range(max(4 - x_max_offset, y_min_offset), min(4 - x_min_offset, y_max_offset) + 1):
-            affected.append((x + offset, y - offset, 3))
-        return affected
+        return affected_conditions(self.game.size, point)
+
+    def get_affected_indices(self, point):
+        """Returns the affected conditions of point as indices into the flattened conditions"""
+        offsets, indices = get_affected_index(self.game.size)
+        point_num = self.game.point_num(point)
+        return indices[offsets[point_num]:offsets[point_num + 1]]
 
     def new_move(self, point, side):
         """Updates win and lose conditions with latest move"""
-        for x, y, n in self.get_affected_conditions(point):
-            if side == self.side:
-                if self.win_conditions[x][y][n] != -1:
-                    self.win_conditions[x][y][n] += 1
-                self.lose_conditions[x][y][n] = -1
-            else:
-                if self.lose_conditions[x][y][n] != -1:
-                    self.lose_conditions[x][y][n] += 1
-                self.win_conditions[x][y][n] = -1
+        indices = self.get_affected_indices(point)
+        win_conditions = self.win_conditions.reshape(-1)
+        lose_conditions = self.lose_conditions.reshape(-1)
+        self.history.append((indices, win_conditions[indices], lose_conditions[indices]))
+        if side == self.side:
+            win_conditions[indices] += win_conditions[indices] != -1
+            lose_conditions[indices] = -1
+        else:
+            lose_conditions[indices] += lose_conditions[indices] != -1
+            win_conditions[indices] = -1
+
+    def undo_move(self):
+        """Reverts win and lose conditions to before the latest move"""
+        indices, win_values, lose_values = self.history.pop()
+        self.win_conditions.reshape(-1)[indices] = win_values
+        self.lose_conditions.reshape(-1)[indices] = lose_values
+
+    def place(self, point, side):
+        """Places a piece of side on the game and updates the conditions. Used by searches, see undo"""
+        self.game.place(point, side)
+        self.new_move(point, side)
+
+    def undo(self):
+        """Removes the last piece from the game and reverts the conditions"""
+        self.game.undo()
+        self.undo_move()
+
+    def get_conditions(self, side):
+        """Returns (own, opponent) conditions from the perspective of side"""
+        if side == self.side:
+            return self.win_conditions, self.lose_conditions
+        return self.lose_conditions, self.win_conditions
+
+    def get_top_moves(self, side, count):
+        """
+        Returns (point_nums, scores) arrays of the count best candidate points (Game.get_candidates) for side,
+        best first
+        """
+        points = np.array(self.game.get_candidates(), dtype=int)
+        count = min(count, len(points))
+        if count == 0:
+            return points[:0], np.zeros(0)
+        scores = score_points(*self.get_conditions(side), points)
+        best = np.argpartition(-scores, count - 1)[:count]
+        best = best[np.argsort(-scores[best], kind='mergesort')]
+        return points[best], scores[best]
 
     def get_next_move(self):
         """Returns (x, y) for next move, or None if not bot's turn"""
         if self.side != self.game.get_current_side():
             return None
 
-        best_points = []
-        highest = 0
-        for y in range(self.game.size):
-            for x in range(self.game.size):
-                if self.game.get_point((x, y)) == 0:
-                    # Point is blank - can place
-                    score = self.get_score((x, y))
-                    if score > highest:
-                        highest = score
-                        best_points = [(x, y)]
-                    elif score == highest:
-                        best_points.append((x, y))
+        if self.book is not None:
+            point = self.book.get_move(self.game)
+            if point is not None:
+                return point
+
+        best_points = None
+        if self.cache is not None:
+            # Side to move follows from the position, so the hash and the settings changing the best points
+            #   are enough as key. With candidates, the points scored depend on the radius of the game
+            key = self.game.size, self.game.hash, self.game.radius if self.candidates else None
+            best_points = self.cache.get(key)
+        if best_points is None:
+            best_points = self.get_best_points()
+            if self.cache is not None:
+                self.cache.put(key, best_points, sys.getsizeof(best_points) + cached_point_bytes * len(best_points))
 
         if len(best_points) == 0:
             return None  # no points
-
         return random.choice(best_points)
 
+    def get_best_points(self):
+        """Returns all empty points with the highest score, in the order of iterating y, then x"""
+        if self.candidates:
+            point_nums = np.array(self.game.get_candidates(), dtype=int)
+            if len(point_nums) == 0:
+                return []
+            scores = score_points(self.win_conditions, self.lose_conditions, point_nums)
+            return [self.game.point_from_num(int(point_num)) for point_num in point_nums[scores == scores.max()]]
+
+        # Scores indexed [y][x], with occupied points set to -1
+        scores = self.get_scores().T
+        scores[np.array(self.game.board) != 0] = -1
+        highest = scores.max()
+        if highest < 0:
+            return []
+        ys, xs = np.nonzero(scores == highest)
+        return [(int(x), int(y)) for y, x in zip(ys, xs)]
+
+    def get_scores(self):
+        """Returns scores of all points as an array indexed [x][y], same as get_score for each point"""
+        return score_conditions(self.win_conditions, self.lose_conditions)
+
     def get_score(self, point):
         """Returns score of given point (x, y). Higher the better"""
-        win_scores = [0, 10, 50, 200, 1000, math.inf]
-        lose_scores = [0, 10, 50, 200, 1000, 10000]
-        score = 0
-        for x, y, n in self.get_affected_conditions(point):
-            score += win_scores[self.win_conditions[x][y][n] + 1]
-            score += lose_scores[self.lose_conditions[x][y][n] + 1]
-        return score
+        indices = self.get_affected_indices(point)
+        score = win_score_table[self.win_conditions.reshape(-1)[indices] + 1].sum()
+        score += lose_score_table[self.lose_conditions.reshape(-1)[indices] + 1].sum()
+        return float(score)
 
 
 def main():
@@ -1,5 +1,8 @@
+import argparse
+
 from Game import Game
 from GameBot import GameBot
+import GameProfiler
 
 
 # Command line controller for Game
@@ -52,6 +55,37 @@ class GameController:
             return self.bot.get_next_move()
 
 
+def main():
+    parser = argparse.ArgumentParser(description='Plays against GameBot in the command line')
+    parser.add_argument('--size', type=int, default=15)
+    parser.add_argument('--profile', default=None, help='write timings of bot and game functions as JSON to this file')
+    parser.add_argument('--cprofile', default=None, help='write cProfile stats (see pstats) to this file')
+    parser.add_argument('--cprofile-scope', default='game', choices=['game', 'move'],
+                        help='profile the whole game, or only the first bot move')
+    args = parser.parse_args()
+
+    def bot_init(game, side):
+        bot = GameBot(game, side)
+        if args.cprofile and args.cprofile_scope == 'move':
+            GameProfiler.capture_next_move(bot, args.cprofile)
+        return bot
+
+    if args.profile:
+        GameProfiler.profiler.enable()
+    capture = GameProfiler.CProfileCapture(args.cprofile)
+    try:
+        controller = GameController(bot_init=bot_init, bot_side=1)
+        if args.cprofile and args.cprofile_scope == 'game':
+            with capture:
+                controller.new_game(size=args.size)
+        else:
+            controller.new_game(size=args.size)
+    finally:
+        if args.profile:
+            GameProfiler.profiler.disable()
+            GameProfiler.profiler.dump(args.profile)
+            print(GameProfiler.profiler.summary())
+
+
 if __name__ == '__main__':
-    controller = GameController(bot_init=GameBot, bot_side=1)
-    controller.new_game(size=15)
+    main()
@@ -1,7 +1,10 @@
+import argparse
+import queue
+import threading
 from tkinter import *
 
 from Game import Game
-from GameBot import GameBot
+from GameArena import bot_factories
 
 # Graphic Constants
 canvas_size = 600
@@ -14,17 +17,24 @@ line_color = 'black'
 piece1_color = 'black'
 piece2_color = 'white'
 
+# Milliseconds between checks for the move of the bot worker thread
+poll_interval = 20
+
 
 class GameWindow(Frame):
     """Minimal GUI used for training"""
 
-    def __init__(self, master=None, play_bot=False, bot_init=None, bot_side=2):
+    def __init__(self, master=None, play_bot=False, bot_init=None, bot_side=2, time_limit=None):
         """
         bot_init: lambda game, side: SomeBot()
         Bot requirements:
             .get_next_move() -> (x, y)  # computes next move
             .new_move(point, side)  # indicates a piece was placed
             .side: int  # 1 or 2
+            .stop()  # optional, ends the move being computed when a new game starts
+        time_limit: seconds per move, set on bots that have a time_limit (SearchBot, MCTSBot)
+            Other bots (e.g. GameBot) are not limited, they compute a move in one pass over the board
+        Bot moves are computed on a worker thread, so the window stays responsive while the bot thinks
         """
 
         Frame.__init__(self, master)
@@ -55,12 +65,19 @@ class GameWindow(Frame):
         self.game_status = 0
         self.game = Game()
 
+        # Init bot worker state
+        # generation is increased on every new game, so moves computed for an older game are discarded
+        self.bot_moves = queue.Queue()  # (generation, point) computed by worker threads
+        self.generation = 0
+        self.thinking = False
+
         # Init bot
+        self.time_limit = time_limit
         if bot_init and play_bot:
             self.play_bot = True
             self.bot_init = bot_init
             self.bot_side = bot_side
-            self.bot = bot_init(self.game, self.bot_side)
+            self.bot = self.init_bot()
         else:
             self.play_bot = False
 
@@ -77,8 +94,15 @@ class GameWindow(Frame):
         else:
             self.game = Game()
 
+        # Cancel the move the bot may be computing for the previous game
+        if self.thinking and hasattr(self.bot, 'stop'):
+            # Otherwise the search goes on until its time limit on a board nobody looks at
+            self.bot.stop()
+        self.generation += 1
+        self.thinking = False
+
         if self.play_bot:
-            self.bot = self.bot_init(self.game, self.bot_side)
+            self.bot = self.init_bot()
 
         # Updates game logic
         self.current_side = 1 if len(self.game.moves) % 2 == 0 else 2
@@ -96,6 +120,13 @@ class GameWindow(Frame):
 
         self.bot_move()
 
+    def init_bot(self):
+        """Returns a new bot for the current game"""
+        bot = self.bot_init(self.game, self.bot_side)
+        if self.time_limit is not None and hasattr(bot, 'time_limit'):
+            bot.time_limit = self.time_limit
+        return bot
+
     def draw_lines(self):
         """Draw board lines"""
         for i in range(self.board_size):
@@ -148,14 +179,45 @@ class GameWindow(Frame):
             return False
 
     def bot_move(self):
-        """Bot makes the move, if necessary"""
+        """Starts computing the bot's move on a worker thread, if necessary"""
         if self.play_bot and self.current_side == self.bot.side:
-            next_point = self.bot.get_next_move()
-            self.place_piece(next_point)
+            self.thinking = True
+            self.update_panel()
+            # The bot uses the game while thinking, the window leaves it alone until the move is back
+            thread = threading.Thread(target=self.compute_bot_move, args=(self.bot, self.generation))
+            thread.daemon = True
+            thread.start()
+            self.after(poll_interval, self.poll_bot_move, self.generation)
+
+    def compute_bot_move(self, bot, generation):
+        """Runs on the worker thread. Posts the move to bot_moves, never touches Tk"""
+        point = None
+        try:
+            point = bot.get_next_move()
+        finally:
+            self.bot_moves.put((generation, point))
+
+    def poll_bot_move(self, generation):
+        """Checks for the bot's move from the Tk event loop, until it arrives or a new game starts"""
+        if generation != self.generation:
+            return
+        while True:
+            try:
+                move_generation, point = self.bot_moves.get_nowait()
+            except queue.Empty:
+                self.after(poll_interval, self.poll_bot_move, generation)
+                return
+            if move_generation == generation:
+                break  # moves of older games are dropped
+
+        self.thinking = False
+        if point is None or not self.place_piece(point):
+            # Bot failed to move
+            self.panel_label.config(text='Bot could not move')
 
     def click_handler(self, event):
         """Handles click event on canvas"""
-        if self.game_status == 0 and 0 <= event.x <= canvas_size and 0 <= event.y <= canvas_size:
+        if self.game_status == 0 and not self.thinking and 0 <= event.x <= canvas_size and 0 <= event.y <= canvas_size:
             # Compute board_x and board_y
             board_x = int((event.x - self.line_space) / (self.line_space + line_width) + 0.5)
             board_y = int((event.y - self.line_space) / (self.line_space + line_width) + 0.5)
@@ -170,6 +232,8 @@ class GameWindow(Frame):
             self.panel_label.config(text='Player 1 Wins')
         elif self.game_status == 2:
             self.panel_label.config(text='Player 2 Wins')
+        elif self.thinking:
+            self.panel_label.config(text='Player {} Thinking...'.format(self.current_side))
         else:
             if self.current_side == 1:
                 self.panel_label.config(text='Next Turn: Player 1')
@@ -182,14 +246,22 @@ class GameWindow(Frame):
 
 
 def main():
+    parser = argparse.ArgumentParser(description='Plays Connect 5 against a bot in a window')
+    parser.add_argument('--bot', default='GameBot', choices=sorted(bot_factories))
+    parser.add_argument('--bot-side', type=int, default=2, choices=[1, 2])
+    parser.add_argument('--time-limit', type=float, default=1.0,
+                        help='seconds per move for SearchBot and MCTSBot, other bots are not limited')
+    args = parser.parse_args()
+
     root = Tk()
     geometry = str(canvas_size) + 'x' + str(canvas_size + panel_height)
     root.geometry(geometry)
 
     app = GameWindow(root,
                      play_bot=True,
-                     bot_init=lambda game, side: GameBot(game, side),
-                     bot_side=2)
+                     bot_init=bot_factories[args.bot],
+                     bot_side=args.bot_side,
+                     time_limit=args.time_limit)
 
     root.mainloop()
 
@@ -1,16 +1,77 @@
+from collections import namedtuple
+
+from Game import Game, candidate_radius
 
 filename = 'GameData.txt'
 
 
-# Returns list of game_str saved in file
-def load_games():
-    f = open(filename, 'r')
+class GameRecord(namedtuple('GameRecord', ['result', 'size', 'moves'])):
+    """A saved game parsed without building its board. result is 0/1/2, same as game_str"""
+
+    def to_game(self, ply=None, radius=candidate_radius):
+        """Returns the Game after the first ply moves (default: all), see Game.from_moves"""
+        return Game.from_moves(self.moves, self.size, ply, radius)
+
+    def game_str(self):
+        moves_str = ' '.join(str(move) for move in self.moves)
+        return ' '.join([str(self.result), str(self.size), str(len(self.moves)), moves_str])
+
+
+# Returns list of game_str saved in file (default: filename)
+# Reads the whole file into memory, use iter_games for large files
+def load_games(path=None):
+    f = open(path or filename, 'r')
     lines = f.read().splitlines()
     f.close()
     return lines
 
 
-def save_game(game_str):
-    f = open(filename, 'a')
+# Appends game_str to file (default: filename)
+def save_game(game_str, path=None):
+    f = open(path or filename, 'a')
     f.write(game_str + '\n')
     f.close()
+
+
+# Yields a GameRecord for every game in file (default: filename), reading one game at a time
+# The file can be text (game_str per line) or a binary archive (see GameArchive)
+# Games are filtered on size, result and number of moves before their moves are parsed
+def iter_games(path=None, size=None, result=None, min_moves=None, max_moves=None):
+    path = path or filename
+    with open(path, 'rb') as f:
+        is_archive = f.read(4) == b'C5GA'
+
+    def accept(game_result, game_size, move_count):
+        return ((size is None or game_size == size) and
+                (result is None or game_result == result) and
+                (min_moves is None or move_count >= min_moves) and
+                (max_moves is None or move_count <= max_moves))
+
+    if is_archive:
+        # Imported here since GameArchive uses GameIO
+        from GameArchive import GameArchive
+        for game_size, game_result, moves in GameArchive(path):
+            if accept(game_result, game_size, len(moves)):
+                yield GameRecord(game_result, game_size, moves)
+        return
+
+    with open(path, 'r') as f:
+        for line in f:
+            data = line.rstrip('\n').split(' ', 3)
+            if len(data) < 4:
+                continue
+            game_result, game_size, move_count = int(data[0]), int(data[1]), int(data[2])
+            if accept(game_result, game_size, move_count):
+                yield GameRecord(game_result, game_size, [int(move_str) for move_str in data[3].split()])
+
+
+# Yields lists of up to batch_size GameRecord from iter_games, for bulk processing
+def iter_batches(batch_size, path=None, **filters):
+    batch = []
+    for record in iter_games(path, **filters):
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,231 @@
+import bisect
+import cProfile
+import functools
+import inspect
+import io
+import json
+import pstats
+import time
+
+from Game import Game
+from GameBot import GameBot
+import GameIO
+
+# Upper bounds (seconds) of the histogram buckets of TimingStats: 20 per decade from 100ns to 100s
+bucket_bounds = [1e-7 * 10 ** (i / 20) for i in range(181)]
+
+# Functions timed by Profiler.enable, as (owner, attribute name, label)
+# owner is a class or module, the attribute is replaced by a timing wrapper only while enabled
+default_targets = [
+    (GameBot, 'get_next_move', 'GameBot.get_next_move'),
+    (GameBot, 'get_best_points', 'GameBot.get_best_points'),
+    (GameBot, 'get_scores', 'GameBot.get_scores'),
+    (GameBot, 'get_score', 'GameBot.get_score'),
+    (GameBot, 'new_move', 'GameBot.new_move'),
+    (Game, 'place', 'Game.place'),
+    (Game, 'check_win', 'Game.check_win'),
+    (Game, 'check_game_status', 'Game.check_game_status'),
+    (GameIO, 'load_games', 'GameIO.load_games'),
+    (GameIO, 'save_game', 'GameIO.save_game'),
+    (GameIO, 'iter_games', 'GameIO.iter_games'),
+]
+
+
+class TimingStats:
+    """Count, total, min, max and a log-scale histogram of the durations of one function"""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(bucket_bounds) + 1)  # last bucket is everything above the bounds
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(bucket_bounds, seconds)] += 1
+
+    def merge(self, data):
+        """Adds the stats of data, a dict from to_dict (e.g. from another process)"""
+        self.count += data['count']
+        self.total += data['total']
+        if data['min'] is not None:
+            self.min = data['min'] if self.min is None else min(self.min, data['min'])
+        if data['max'] is not None:
+            self.max = data['max'] if self.max is None else max(self.max, data['max'])
+        for index, count in data['buckets']:
+            self.buckets[index] += count
+
+    def percentile(self, p):
+        """Returns the upper bound of the histogram bucket holding the p-th percentile (0 - 100)"""
+        if self.count == 0:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(bucket_bounds[index], self.max) if index < len(bucket_bounds) else self.max
+        return self.max
+
+    def to_dict(self):
+        """Returns the stats as a JSON serializable dict. Histogram buckets are (index, count), non-empty only"""
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'buckets': [(index, count) for index, count in enumerate(self.buckets) if count],
+        }
+
+
+class Profiler:
+    """
+    Opt-in timing of the functions in targets
+    Nothing is changed until enable, which replaces each function with a wrapper recording its duration,
+    so a disabled profiler costs nothing. disable restores the original functions
+    """
+
+    def __init__(self, targets=None):
+        self.targets = targets if targets is not None else default_targets
+        self.stats = {}  # label -> TimingStats
+        self.originals = []  # (owner, name, original attribute) while enabled
+
+    @property
+    def enabled(self):
+        return len(self.originals) > 0
+
+    def enable(self):
+        if self.enabled:
+            return
+        for owner, name, label in self.targets:
+            original = owner.__dict__[name]
+            self.originals.append((owner, name, original))
+            setattr(owner, name, self.wrap(original, self.get_stats(label)))
+
+    def disable(self):
+        for owner, name, original in reversed(self.originals):
+            setattr(owner, name, original)
+        self.originals = []
+
+    def reset(self):
+        """Clears the stats. Enabled wrappers keep recording into the same TimingStats"""
+        for stats in self.stats.values():
+            stats.clear()
+
+    def get_stats(self, label):
+        if label not in self.stats:
+            self.stats[label] = TimingStats()
+        return self.stats[label]
+
+    @staticmethod
+    def wrap(function, stats):
+        """Returns function wrapped to add its durations to stats. Generators are timed per next() call"""
+        if inspect.isgeneratorfunction(function):
+            @functools.wraps(function)
+            def generator_wrapper(*args, **kwargs):
+                generator = function(*args, **kwargs)
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        return
+                    finally:
+                        stats.add(time.perf_counter() - start)
+                    yield item
+            return generator_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stats.add(time.perf_counter() - start)
+        return wrapper
+
+    def merge(self, data):
+        """Adds stats from to_dict, e.g. collected in another process"""
+        for label, stats in data.items():
+            self.get_stats(label).merge(stats)
+
+    def to_dict(self):
+        return {label: stats.to_dict() for label, stats in sorted(self.stats.items())}
+
+    def dump(self, path):
+        """Writes the stats to path as JSON"""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self):
+        """Returns the stats as a printable table"""
+        lines = ['{:<26} {:>9} {:>10} {:>10} {:>10} {:>10}'.format(
+            'function', 'calls', 'total s', 'p50 us', 'p90 us', 'p99 us')]
+        for label, stats in sorted(self.stats.items()):
+            if stats.count == 0:
+                continue
+            lines.append('{:<26} {:>9} {:>10.3f} {:>10.1f} {:>10.1f} {:>10.1f}'.format(
+                label, stats.count, stats.total, stats.percentile(50) * 1e6, stats.percentile(90) * 1e6,
+                stats.percentile(99) * 1e6))
+        return '\n'.join(lines)
+
+
+# Profiler used by the command line flags, see GameController and GameArena
+profiler = Profiler()
+
+
+class CProfileCapture:
+    """
+    Context manager running cProfile on its body, e.g. a single move or a whole game
+    Stats are written to path (readable with pstats) if given, and kept in stats
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.profile = cProfile.Profile()
+        self.stats = None
+
+    def __enter__(self):
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *args):
+        self.profile.disable()
+        self.stats = pstats.Stats(self.profile)
+        if self.path:
+            self.stats.dump_stats(self.path)
+
+    def summary(self, limit=20, sort='cumulative'):
+        """Returns the top limit functions of the capture as printable text"""
+        stream = io.StringIO()
+        pstats.Stats(self.profile, stream=stream).sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+
+def profile_move(bot, path=None):
+    """Returns (move, CProfileCapture) for a single bot.get_next_move() run under cProfile"""
+    with CProfileCapture(path) as capture:
+        move = bot.get_next_move()
+    return move, capture
+
+
+def capture_next_move(bot, path=None):
+    """Makes only the next bot.get_next_move() run under cProfile, writing its stats to path"""
+    def get_next_move():
+        del bot.get_next_move  # back to the class method
+        move, _ = profile_move(bot, path)
+        return move
+    bot.get_next_move = get_next_move
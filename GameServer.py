@@ -0,0 +1,500 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from Game import Game
+from GameArena import bot_factories, get_bot_init
+from GameProfiler import TimingStats
+
+# Newline-delimited JSON protocol. Every request is one JSON object per line with a 'type', and may carry an 'id'
+# which is echoed in the response. Requests:
+#   {"type": "new_game", "size": 15, "bots": {"2": "GameBot"}, "time_limit": 0.5}
+#       sides without a bot are played by the client. Response: {"type": "game", "game_id", "size", "bots"}
+#   {"type": "move", "game_id", "point": [x, y]}  places a piece for the side to move
+#   {"type": "state", "game_id"}  response: {"type": "state", "game_id", "game_str", "status", "side"}
+#   {"type": "close", "game_id"}
+#   {"type": "metrics"}  response: {"type": "metrics", ...}, see GameServer.get_metrics
+# Events sent for every move of a game, by the client or a bot:
+#   {"type": "move", "game_id", "side", "point": [x, y], "status"}, status is Game.check_game_status
+#   {"type": "end", "game_id", "status", "reason"} when a bot fails or times out, or the game is idle too long
+# Errors: {"type": "error", "message"}
+
+
+class ServerError(Exception):
+    """Raised by request handlers, sent to the client as an error message"""
+
+
+class Connection:
+    """A client connection. Writes are serialized so events of bot games and responses do not interleave"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.write_lock = asyncio.Lock()
+        self.games = set()  # ids of the games owned by this connection
+        self.closed = False
+
+    async def send(self, message):
+        if self.closed:
+            return
+        async with self.write_lock:
+            self.writer.write(json.dumps(message).encode() + b'\n')
+            try:
+                # Waits while the client is slow to read (backpressure)
+                await self.writer.drain()
+            except ConnectionError:
+                self.closed = True
+
+
+class ServerGame:
+    """
+    A game hosted by the server, with its bots by side. The lock serializes moves
+    Each bot plays on its own copy of the game, since searching bots place and undo moves on their game from the
+    executor thread. The served game only ever holds the moves actually played
+    """
+
+    def __init__(self, game_id, game, bots, bot_games, owner):
+        self.game_id = game_id
+        self.game = game
+        self.bots = bots  # side -> bot
+        self.bot_games = bot_games  # side -> copy of game used by the bot of side
+        self.owner = owner
+        self.lock = asyncio.Lock()
+        self.status = 0  # Game.check_game_status, or the winner by forfeit
+        self.closed = False  # finished or closed, see GameServer.finish
+        self.last_activity = time.monotonic()
+        self.task = None  # task playing bot moves
+
+
+class GameServer:
+    """
+    Hosts many games (client vs bot, bot vs bot, client vs client) from one process
+    Bot moves run in a thread pool of max_workers, at most max_pending at a time. Further bot moves wait,
+    and connections waiting for them stop reading requests, which pushes back on clients
+    """
+
+    def __init__(self, max_workers=4, max_pending=64, move_timeout=10.0, idle_timeout=300.0, max_games=1000,
+                 time_limit=0.5):
+        """
+        move_timeout: seconds a bot can take for a move before forfeiting the game
+        idle_timeout: seconds a game can wait for a client move before it is closed
+        max_games: active games allowed, new games are refused beyond
+        time_limit: default seconds per move for search bots
+        """
+        self.executor = ThreadPoolExecutor(max_workers)
+        self.pending = asyncio.Semaphore(max_pending)
+        self.max_pending = max_pending
+        self.move_timeout = move_timeout
+        self.idle_timeout = idle_timeout
+        self.max_games = max_games
+        self.time_limit = time_limit
+
+        self.games = {}  # game_id -> ServerGame
+        self.next_game_id = 1
+        self.connections = set()
+        self.servers = []
+        self.reaper = None
+
+        # Metrics
+        self.counters = {'games_started': 0, 'games_finished': 0, 'moves': 0, 'bot_moves': 0, 'bot_timeouts': 0,
+                         'bot_errors': 0, 'requests': 0, 'errors': 0}
+        self.waiting_bot_moves = 0
+        self.bot_move_latency = TimingStats()  # from requesting a bot move to having it, including the wait
+        self.request_latency = TimingStats()
+
+        self.handlers = {
+            'new_game': self.new_game,
+            'move': self.move,
+            'state': self.state,
+            'close': self.close_game,
+            'metrics': self.metrics,
+        }
+
+    async def start(self, host='127.0.0.1', port=5555, path=None):
+        """Starts listening on a TCP host and port, or a Unix socket path"""
+        if path:
+            server = await asyncio.start_unix_server(self.handle_connection, path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        self.servers.append(server)
+        if self.reaper is None:
+            self.reaper = asyncio.ensure_future(self.reap_idle_games())
+        return server
+
+    async def close(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        if self.reaper is not None:
+            self.reaper.cancel()
+        for server_game in list(self.games.values()):
+            await self.finish(server_game, server_game.status, 'server closed')
+        self.executor.shutdown(wait=False)
+
+    async def handle_connection(self, reader, writer):
+        connection = Connection(reader, writer)
+        self.connections.add(connection)
+        try:
+            while not connection.closed:
+                line = await reader.readline()
+                if not line:
+                    break
+                # One request at a time per connection, so a client waiting on a slow bot is not read from
+                await self.handle_line(connection, line)
+        except ConnectionError:
+            pass
+        finally:
+            connection.closed = True
+            self.connections.discard(connection)
+            for game_id in list(connection.games):
+                server_game = self.games.get(game_id)
+                if server_game is not None:
+                    await self.finish(server_game, server_game.status, 'disconnected')
+            writer.close()
+
+    async def handle_line(self, connection, line):
+        start = time.perf_counter()
+        self.counters['requests'] += 1
+        request_id = None
+        try:
+            request = json.loads(line.decode())
+            if not isinstance(request, dict):
+                raise ServerError('Request must be a JSON object')
+            request_id = request.get('id')
+            handler = self.handlers.get(request.get('type'))
+            if handler is None:
+                raise ServerError('Unknown request type: {}'.format(request.get('type')))
+            response = await handler(connection, request)
+        except (ServerError, ValueError, KeyError, TypeError, ArithmeticError) as e:
+            # ArithmeticError: e.g. int() of an infinite number
+            self.counters['errors'] += 1
+            response = {'type': 'error', 'message': str(e)}
+        if response is not None:
+            if request_id is not None:
+                response['id'] = request_id
+            await connection.send(response)
+        self.request_latency.add(time.perf_counter() - start)
+
+    def get_game(self, connection, request):
+        server_game = self.games.get(request.get('game_id'))
+        if server_game is None or server_game.owner is not connection:
+            raise ServerError('No such game: {}'.format(request.get('game_id')))
+        return server_game
+
+    async def new_game(self, connection, request):
+        if len(self.games) >= self.max_games:
+            raise ServerError('Too many games')
+        size = int(request.get('size', 15))
+        if not 5 <= size <= 25:
+            raise ServerError('Invalid size: {}'.format(size))
+        bot_names = request.get('bots', {'2': 'GameBot'})
+        if not isinstance(bot_names, dict):
+            raise ServerError('bots must map sides to bot names')
+        time_limit = float(request.get('time_limit', self.time_limit))
+        # Also refuses nan, which never ends a search
+        if not 0 < time_limit <= self.move_timeout:
+            raise ServerError('Invalid time_limit: {}'.format(time_limit))
+        bots = {}
+        bot_games = {}
+        for side_str, name in bot_names.items():
+            side = int(side_str)
+            if side not in [1, 2] or name not in bot_factories:
+                raise ServerError('Invalid bot: {} for side {}'.format(name, side_str))
+            bot_games[side] = Game(size=size)
+            bots[side] = get_bot_init(name, time_limit)(bot_games[side], side)
+
+        server_game = ServerGame(self.next_game_id, Game(size=size), bots, bot_games, connection)
+        self.next_game_id += 1
+        self.games[server_game.game_id] = server_game
+        connection.games.add(server_game.game_id)
+        self.counters['games_started'] += 1
+
+        response = {'type': 'game', 'game_id': server_game.game_id, 'size': size, 'bots': bot_names}
+        if request.get('id') is not None:
+            response['id'] = request['id']
+        # Sent here so it comes before the events of the bot moves
+        await connection.send(response)
+        self.schedule_bots(server_game)
+        return None
+
+    async def move(self, connection, request):
+        server_game = self.get_game(connection, request)
+        point = tuple(request['point'])
+        async with server_game.lock:
+            game = server_game.game
+            side = game.get_current_side()
+            if server_game.status != 0:
+                raise ServerError('Game is finished')
+            if side in server_game.bots:
+                raise ServerError('Not your turn')
+            if len(point) != 2 or not game.place((int(point[0]), int(point[1])), side):
+                raise ServerError('Invalid move: {}'.format(list(point)))
+            await self.moved(server_game, (int(point[0]), int(point[1])), side)
+        self.schedule_bots(server_game)
+        return None
+
+    async def state(self, connection, request):
+        server_game = self.get_game(connection, request)
+        game = server_game.game
+        return {'type': 'state', 'game_id': server_game.game_id, 'game_str': game.game_str(),
+                'status': server_game.status, 'side': game.get_current_side()}
+
+    async def close_game(self, connection, request):
+        server_game = self.get_game(connection, request)
+        await self.finish(server_game, server_game.status, 'closed')
+        return {'type': 'closed', 'game_id': server_game.game_id}
+
+    async def metrics(self, connection, request):
+        return dict(self.get_metrics(), type='metrics')
+
+    def get_metrics(self):
+        """Returns counters, active games and connections, and latency percentiles in seconds"""
+        metrics = dict(self.counters)
+        metrics['active_games'] = len(self.games)
+        metrics['connections'] = len(self.connections)
+        metrics['waiting_bot_moves'] = self.waiting_bot_moves
+        for name, stats in [('bot_move', self.bot_move_latency), ('request', self.request_latency)]:
+            for key in ['count', 'mean', 'p50', 'p90', 'p99', 'max']:
+                metrics['{}_{}'.format(name, key)] = stats.to_dict()[key]
+        return metrics
+
+    def schedule_bots(self, server_game):
+        """Starts playing bot moves for the game in a task, if a bot is to move"""
+        if server_game.status == 0 and server_game.game.get_current_side() in server_game.bots:
+            if server_game.task is None or server_game.task.done():
+                server_game.task = asyncio.ensure_future(self.play_bots(server_game))
+
+    async def play_bots(self, server_game):
+        """Plays bot moves until the game is finished or a client is to move"""
+        while server_game.game_id in self.games and server_game.game.get_current_side() in server_game.bots:
+            async with server_game.lock:
+                await self.bot_move(server_game)
+
+    async def bot_move(self, server_game):
+        game = server_game.game
+        side = game.get_current_side()
+        bot = server_game.bots[side]
+        start = time.perf_counter()
+        self.waiting_bot_moves += 1
+        try:
+            async with self.pending:
+                loop = asyncio.get_running_loop()
+                point = await asyncio.wait_for(loop.run_in_executor(self.executor, bot.get_next_move),
+                                               self.move_timeout)
+        except asyncio.TimeoutError:
+            # The bot thread cannot be stopped and may still use the game, so the game ends here
+            self.counters['bot_timeouts'] += 1
+            await self.finish(server_game, 3 - side, 'bot timed out')
+            return
+        except Exception:
+            self.counters['bot_errors'] += 1
+            await self.finish(server_game, 3 - side, 'bot failed')
+            return
+        finally:
+            self.waiting_bot_moves -= 1
+            self.bot_move_latency.add(time.perf_counter() - start)
+
+        if server_game.closed:
+            return  # closed while the bot was thinking
+        if point is None or not game.place(point, side):
+            await self.finish(server_game, 3 - side, 'bot failed')
+            return
+        self.counters['bot_moves'] += 1
+        await self.moved(server_game, point, side)
+
+    async def moved(self, server_game, point, side):
+        """Updates bots (and their games) and clients after side placed a piece at point"""
+        for bot_side, bot in server_game.bots.items():
+            server_game.bot_games[bot_side].place(point, side)
+            bot.new_move(point, side)
+        self.counters['moves'] += 1
+        server_game.last_activity = time.monotonic()
+        status = server_game.game.check_game_status()
+        await server_game.owner.send({'type': 'move', 'game_id': server_game.game_id, 'side': side,
+                                      'point': list(point), 'status': status})
+        if status != 0:
+            await self.finish(server_game, status, None)
+
+    async def finish(self, server_game, status, reason):
+        """Ends the game with status, sending an end event if there is a reason (e.g. a forfeit)"""
+        if self.games.pop(server_game.game_id, None) is None:
+            return
+        server_game.status = status
+        server_game.closed = True
+        # Stops waiting for a bot move. Not when finishing from the task itself, which would drop the end event
+        if server_game.task is not None and server_game.task is not asyncio.current_task():
+            server_game.task.cancel()
+        server_game.owner.games.discard(server_game.game_id)
+        self.counters['games_finished'] += 1
+        if reason is not None:
+            await server_game.owner.send({'type': 'end', 'game_id': server_game.game_id, 'status': status,
+                                          'reason': reason})
+
+    async def reap_idle_games(self):
+        """Closes games waiting for a client move for longer than idle_timeout"""
+        while True:
+            await asyncio.sleep(1)
+            now = time.monotonic()
+            for server_game in list(self.games.values()):
+                game = server_game.game
+                if (game.get_current_side() not in server_game.bots and
+                        now - server_game.last_activity > self.idle_timeout):
+                    await self.finish(server_game, 3 - game.get_current_side(), 'idle')
+
+
+class GameClient:
+    """Client of GameServer, used by the load test. Keeps events of its games in order"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=5555, path=None):
+        if path:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def send(self, message):
+        self.writer.write(json.dumps(message).encode() + b'\n')
+        await self.writer.drain()
+
+    async def receive(self):
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError('Server closed the connection')
+        return json.loads(line.decode())
+
+    async def request(self, message):
+        """Sends message and returns the response of the same type (or an error), skipping other events"""
+        await self.send(message)
+        while True:
+            response = await self.receive()
+            if response['type'] == 'error':
+                raise ServerError(response['message'])
+            if response['type'] in ['game', 'state', 'closed', 'metrics']:
+                return response
+
+    async def close(self):
+        self.writer.close()
+
+    async def play_random_game(self, size=15, bot='GameBot', rng=random, latencies=None):
+        """
+        Plays a game as side 1 against bot with random moves near the center
+        Appends the time from each move to the bot's reply to latencies. Returns the final status
+        """
+        response = await self.request({'type': 'new_game', 'size': size, 'bots': {'2': bot}})
+        game_id = response['game_id']
+        game = Game(size=size)
+        center = size // 2
+        while True:
+            point = None
+            while point is None or game.get_point(point) != 0:
+                radius = min(center, 2 + len(game.moves) // 10)
+                point = (rng.randint(center - radius, center + radius), rng.randint(center - radius, center + radius))
+            start = time.perf_counter()
+            await self.send({'type': 'move', 'game_id': game_id, 'point': list(point)})
+            # Events until it is our turn again or the game ends
+            while True:
+                event = await self.receive()
+                if event['type'] == 'error':
+                    raise ServerError(event['message'])
+                if event.get('game_id') != game_id:
+                    continue
+                if event['type'] == 'end':
+                    return event['status']
+                if event['type'] == 'move':
+                    game.place(tuple(event['point']), event['side'])
+                    if event['status'] != 0:
+                        return event['status']
+                    if event['side'] == 2:
+                        if latencies is not None:
+                            latencies.append(time.perf_counter() - start)
+                        break
+
+
+async def load_test(games=20, concurrency=4, size=15, bot='GameBot', host='127.0.0.1', port=5555, path=None,
+                    seed=0):
+    """
+    Plays games against the server from concurrency clients at once. Returns stats dict with
+    games per second and latency percentiles (seconds) from a client move to the bot's reply
+    """
+    latencies = []
+    results = []
+    remaining = list(range(games))
+    start = time.perf_counter()
+
+    async def worker(index):
+        client = await GameClient.connect(host, port, path)
+        rng = random.Random(seed + index)
+        try:
+            while remaining:
+                remaining.pop()
+                results.append(await client.play_random_game(size, bot, rng, latencies))
+        finally:
+            await client.close()
+
+    await asyncio.gather(*[worker(index) for index in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] if latencies else None
+
+    return {'games': len(results), 'time': elapsed, 'games_per_second': len(results) / elapsed,
+            'moves': len(latencies), 'p50': percentile(50), 'p90': percentile(90), 'p99': percentile(99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hosts games over newline-delimited JSON, or load tests a server')
+    parser.add_argument('command', choices=['serve', 'load-test'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5555)
+    parser.add_argument('--unix', default=None, help='Unix socket path instead of TCP')
+    parser.add_argument('--workers', type=int, default=4, help='threads computing bot moves')
+    parser.add_argument('--max-pending', type=int, default=64, help='bot moves running or queued at once')
+    parser.add_argument('--move-timeout', type=float, default=10.0, help='seconds before a bot forfeits')
+    parser.add_argument('--time-limit', type=float, default=0.5, help='seconds per move for search bots')
+    parser.add_argument('--games', type=int, default=20, help='load-test: games to play')
+    parser.add_argument('--concurrency', type=int, default=4, help='load-test: clients playing at once')
+    parser.add_argument('--size', type=int, default=15, help='load-test: board size')
+    parser.add_argument('--bot', default='GameBot', choices=sorted(bot_factories), help='load-test: opponent')
+    parser.add_argument('--local', action='store_true', help='load-test: run the server in this process')
+    args = parser.parse_args()
+
+    async def serve():
+        server = GameServer(args.workers, args.max_pending, args.move_timeout, time_limit=args.time_limit)
+        await server.start(args.host, args.port, args.unix)
+        print('Serving on ' + (args.unix or '{}:{}'.format(args.host, args.port)))
+        await asyncio.Event().wait()
+
+    async def run_load_test():
+        server = None
+        if args.local:
+            server = GameServer(args.workers, args.max_pending, args.move_timeout, time_limit=args.time_limit)
+            await server.start(args.host, args.port, args.unix)
+        try:
+            stats = await load_test(args.games, args.concurrency, args.size, args.bot, args.host, args.port,
+                                    args.unix)
+        finally:
+            if server is not None:
+                print(json.dumps(server.get_metrics(), sort_keys=True))
+                await server.close()
+        print('{} games in {:.1f}s, {:.2f} games/s'.format(stats['games'], stats['time'], stats['games_per_second']))
+        if stats['moves']:
+            print('Move latency ms: p50 {:.1f}, p90 {:.1f}, p99 {:.1f}'.format(
+                stats['p50'] * 1000, stats['p90'] * 1000, stats['p99'] * 1000))
+
+    try:
+        asyncio.run(serve() if args.command == 'serve' else run_load_test())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
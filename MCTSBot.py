@@ -0,0 +1,231 @@
+import math
+import random
+import time
+import numpy as np
+
+from Game import Game
+from GameBot import GameBot
+from BatchGame import BatchGame, BatchGameBot
+from ThreatSolver import ThreatSolver, get_forced_move
+
+
+class MCTSNode:
+    """Node of the search tree, reached by side playing move (a point number)"""
+
+    def __init__(self, move, side, prior, parent=None):
+        self.move = move
+        self.side = side
+        self.prior = prior
+        self.parent = parent
+        self.children = None  # list of MCTSNode, None until expanded
+        self.visits = 0
+        self.value = 0.0  # sum of rollout results for side. 1: won, 0.5: tie, 0: lost
+        self.status = 0  # game status after move, same as Game.check_game_status
+
+
+class MCTSBot:
+    """
+    Connect5 AI using Monte Carlo Tree Search
+    Children are selected by UCT with priors from the GameBot score heuristic. Leaves are rolled out in
+    batches on a BatchGame, playing the GameBot policy with random noise. The tree is kept between moves
+    Follows the same bot protocol as GameBot
+    """
+
+    def __init__(self, game, side, time_limit=1.0, playouts=None, batch_size=32, width=10, rollout_depth=40,
+                 exploration=1.5, noise=30, solver_nodes=2000, book=None):
+        """
+        time_limit: seconds to search for each move
+        playouts: maximum rollouts for each move (default: no limit)
+        batch_size: leaves rolled out together
+        width: number of candidate moves expanded in each position
+        rollout_depth: rollouts not finished after this many moves count as ties
+        exploration: weight of the prior / exploration term of UCT
+        noise: random score added to each point in rollouts, so rollouts are not deterministic
+        solver_nodes: node budget of the threat solver run before searching (0: no solver)
+        book: OpeningBook queried before searching
+        """
+        self.game = game
+        self.side = side
+        self.time_limit = time_limit
+        self.playouts = playouts
+        self.batch_size = batch_size
+        self.width = width
+        self.rollout_depth = rollout_depth
+        self.exploration = exploration
+        self.noise = noise
+
+        # Tracks win / lose conditions of the real game, from the perspective of side
+        self.evaluator = GameBot(game, side)
+        self.book = book
+        self.solver = ThreatSolver(game, self.evaluator, max_nodes=solver_nodes) if solver_nodes else None
+        self.rollouts = BatchGame(batch_size, game.size, auto_reset=False)
+        self.rollout_bot = BatchGameBot(self.rollouts)
+        self.rng = np.random.RandomState(random.getrandbits(32))
+
+        # Root of the tree is the current position of the game. root_hash detects changes made without new_move
+        self.root = None
+        self.root_hash = None
+
+        # Set by stop, ends the search of the current move
+        self.stopped = False
+
+        # Statistics of the last search
+        self.playout_count = 0
+        self.search_time = 0
+        self.playouts_per_second = 0
+
+    def new_move(self, point, side):
+        """Updates win and lose conditions with latest move, and moves the root to the child for it"""
+        self.evaluator.new_move(point, side)
+        move = self.game.point_num(point)
+        child = None
+        if self.root is not None and self.root.children:
+            child = next((node for node in self.root.children if node.move == move), None)
+        if child is not None:
+            child.parent = None
+            self.root = child
+            self.root_hash = self.game.hash
+        else:
+            self.root = None
+
+    def stop(self):
+        """
+        Ends the move being computed after the current batch, from another thread (e.g. when the game is abandoned)
+        Later moves are not searched, so the bot is no longer usable
+        """
+        self.stopped = True
+        if self.solver is not None:
+            self.solver.deadline = 0
+
+    def get_next_move(self):
+        """Returns (x, y) for next move, or None if not bot's turn"""
+        if self.side != self.game.get_current_side() or self.stopped:
+            return None
+
+        # The solver's time counts against the time limit of the move
+        start = time.perf_counter()
+        deadline = start + self.time_limit
+        point = get_forced_move(self.game, self.book, self.solver, deadline)
+        if point is not None:
+            return point
+
+        if self.root is None or self.root_hash != self.game.hash:
+            self.root = MCTSNode(None, 3 - self.side, 1)
+            self.root_hash = self.game.hash
+        self.expand(self.root)
+        if len(self.root.children) == 0:
+            return None
+        if len(self.root.children) == 1:
+            return self.game.point_from_num(self.root.children[0].move)
+
+        self.playout_count = 0
+        while (time.perf_counter() < deadline and not self.stopped and
+               (self.playouts is None or self.playout_count < self.playouts)):
+            self.run_batch()
+
+        self.search_time = time.perf_counter() - start
+        self.playouts_per_second = self.playout_count / self.search_time if self.search_time > 0 else 0
+        best = max(self.root.children, key=lambda node: node.visits)
+        return self.game.point_from_num(best.move)
+
+    def run_batch(self):
+        """Selects a batch of leaves, rolls them out together and backs up the results"""
+        paths = []
+        for b in range(self.batch_size):
+            path = self.select()
+            paths.append(path)
+            leaf = path[-1]
+            self.expand(leaf)
+            # Finished games are loaded too, their status is the result
+            self.rollouts.load_game(b, self.game)
+            for _ in path[1:]:
+                self.evaluator.undo()
+
+        results = self.rollout()
+        for path, status in zip(paths, results):
+            for node in path:
+                # Visits were already added when selecting
+                if status == node.side:
+                    node.value += 1
+                elif status not in [1, 2]:
+                    node.value += 0.5
+        self.playout_count += self.batch_size
+
+    def select(self):
+        """
+        Walks down from the root to a leaf by UCT, making the moves on the game
+        Adds a visit to every node on the path (a virtual loss until the result is backed up)
+        Returns the path of nodes
+        """
+        node = self.root
+        node.visits += 1
+        path = [node]
+        while node.children:
+            scale = self.exploration * math.sqrt(node.visits)
+            best = node.children[0]
+            best_value = -1
+            for child in node.children:
+                mean = child.value / child.visits if child.visits > 0 else 0.5
+                value = mean + scale * child.prior / (1 + child.visits)
+                if value > best_value:
+                    best_value = value
+                    best = child
+            node = best
+            node.visits += 1
+            path.append(node)
+            self.evaluator.place(self.game.point_from_num(node.move), node.side)
+            node.status = self.game.check_game_status()
+            if node.status != 0:
+                break
+        return path
+
+    def expand(self, node):
+        """Adds the best candidate moves of the current position as children of node"""
+        if node.children is not None or node.status != 0:
+            return
+        side = 3 - node.side
+        moves, scores = self.evaluator.get_top_moves(side, self.width)
+        node.children = []
+        if len(moves) == 0:
+            return
+        if math.isinf(scores[0]):
+            # Winning move, no need to look at others
+            moves = moves[:1]
+            priors = np.ones(1)
+        else:
+            # Priors proportional to score
+            priors = scores + 1
+            priors = priors / priors.sum()
+        node.children = [MCTSNode(int(move), side, float(prior), node) for move, prior in zip(moves, priors)]
+
+    def rollout(self):
+        """Plays out the loaded rollout boards. Returns their status, with unfinished games as 0"""
+        rollouts = self.rollouts
+        for _ in range(self.rollout_depth):
+            if (rollouts.status != 0).all():
+                break
+            # GameBot policy with noise: best point of score + random noise
+            scores = np.swapaxes(self.rollout_bot.get_scores(), 1, 2).reshape(rollouts.batch_size, -1)
+            scores += self.rng.random_sample(scores.shape) * self.noise
+            scores[rollouts.boards.reshape(rollouts.batch_size, -1) != 0] = -1
+            moves = scores.argmax(axis=1)
+            rollouts.step(np.where(rollouts.status == 0, moves, -1))
+        return rollouts.status.copy()
+
+
+def main():
+    game = Game(size=15)
+    bots = {1: MCTSBot(game, 1, time_limit=1), 2: GameBot(game, 2)}
+    while game.check_game_status() == 0:
+        side = game.get_current_side()
+        point = bots[side].get_next_move()
+        game.place(point, side)
+        for bot in bots.values():
+            bot.new_move(point, side)
+    game.print_board()
+    print('Status: ' + str(game.check_game_status()))
+    print('Last search: {} playouts, {:.0f} playouts/s'.format(bots[1].playout_count, bots[1].playouts_per_second))
+
+
+if __name__ == '__main__':
+    main()
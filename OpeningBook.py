@@ -0,0 +1,164 @@
+import argparse
+import struct
+import numpy as np
+
+from Game import Game, get_symmetries
+import GameIO
+
+# Opening book: move statistics of the first plies of saved games, aggregated per canonical position
+# Layout (little endian):
+#   header: magic (4 bytes), version (u16), board size (u16), entry count (u64), reserved (u64)
+#   keys: canonical hash of the position of each entry (u64 * entry count), sorted
+#   stats: canonical move, games, wins, draws of each entry (u32 * 4 * entry count), from the perspective of
+#       the side to move. Entries of the same position are contiguous
+magic = b'C5OB'
+version = 1
+header_format = '<4sHHQQ'
+header_size = struct.calcsize(header_format)
+
+# Inverse board symmetries for each board size, see get_inverse_symmetries
+inverse_symmetry_cache = {}
+
+# Books opened in this process by path, see get_book
+book_cache = {}
+
+
+def get_inverse_symmetries(size):
+    """Returns the inverse of each symmetry of get_symmetries, mapping the image point_num back"""
+    if size not in inverse_symmetry_cache:
+        inverses = []
+        for symmetry in get_symmetries(size):
+            inverse = [0] * (size * size)
+            for point_num, image in enumerate(symmetry):
+                inverse[image] = point_num
+            inverses.append(inverse)
+        inverse_symmetry_cache[size] = inverses
+    return inverse_symmetry_cache[size]
+
+
+def canonical_move(game, move):
+    """
+    Returns move (point_num) transformed into the canonical form of the game's position
+    Symmetric positions have several canonical symmetries, the smallest image is used so equivalent moves match
+    """
+    hashes = game.symmetry_hashes
+    lowest = min(hashes)
+    return min(game.symmetries[i][move] for i, value in enumerate(hashes) if value == lowest)
+
+
+def build_book(book_path, size, path=None, max_plies=10, min_games=2, **filters):
+    """
+    Builds an opening book of size from the games in path (text or archive, default: GameIO.filename)
+    Every move of the first max_plies plies of each game is counted as a win, draw or loss for the side that
+    played it. Moves played in fewer than min_games games are left out
+    Returns the number of entries written
+    """
+    stats = {}  # (canonical hash, canonical move) -> [games, wins, draws]
+    for record in GameIO.iter_games(path, size=size, **filters):
+        game = Game(size=size)
+        for move in record.moves[:max_plies]:
+            move = int(move)
+            side = game.get_current_side()
+            key = game.canonical_hash(), canonical_move(game, move)
+            entry = stats.get(key)
+            if entry is None:
+                entry = stats[key] = [0, 0, 0]
+            entry[0] += 1
+            if record.result == side:
+                entry[1] += 1
+            elif record.result == 0:
+                entry[2] += 1
+            if not game.place(game.point_from_num(move), side):
+                break
+
+    items = sorted((key, entry) for key, entry in stats.items() if entry[0] >= min_games)
+    keys = np.array([key[0] for key, _ in items], dtype='<u8')
+    data = np.array([(key[1],) + tuple(entry) for key, entry in items], dtype='<u4').reshape(-1, 4)
+    with open(book_path, 'wb') as f:
+        f.write(struct.pack(header_format, magic, version, size, len(items), 0))
+        f.write(keys.tobytes())
+        f.write(data.tobytes())
+    return len(items)
+
+
+class OpeningBook:
+    """
+    Reads an opening book through a memory map. Positions are found by binary search on the sorted keys,
+    so a lookup costs a few microseconds whatever the size of the book
+    """
+
+    def __init__(self, path, min_games=2):
+        """min_games: moves played in fewer games are ignored by get_move"""
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+        file_magic, file_version, self.size, count, _ = struct.unpack(header_format, data[:header_size].tobytes())
+        if file_magic != magic or file_version != version:
+            raise ValueError('Not an opening book: ' + str(path))
+        keys_end = header_size + 8 * count
+        self.keys = data[header_size:keys_end].view('<u8')
+        self.stats = data[keys_end:keys_end + 16 * count].view('<u4').reshape(-1, 4)
+        self.min_games = min_games
+        self.inverse_symmetries = get_inverse_symmetries(self.size)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get_entries(self, game):
+        """
+        Returns the stats (move, games, wins, draws) of the game's position as an array,
+        with moves converted from the canonical position back to the game's points
+        """
+        if game.size != self.size:
+            return np.zeros((0, 4), dtype=np.int64)
+        key = np.uint64(game.canonical_hash())
+        start = np.searchsorted(self.keys, key, side='left')
+        end = np.searchsorted(self.keys, key, side='right')
+        entries = np.array(self.stats[start:end], dtype=np.int64)
+        inverse = self.inverse_symmetries[game.canonical_symmetry()]
+        for entry in entries:
+            entry[0] = inverse[entry[0]]
+        return entries
+
+    def get_move(self, game):
+        """
+        Returns (x, y) of the book move with the highest score (wins + draws / 2 per game) for the side to move,
+        or None if the position is not in the book
+        """
+        best_point = None
+        best_score = None
+        for move, games, wins, draws in self.get_entries(game):
+            if games < self.min_games:
+                continue
+            point = game.point_from_num(int(move))
+            if game.get_point(point) != 0:
+                continue  # hash collision
+            # Ties go to the move played most
+            score = (wins + draws / 2) / games, games
+            if best_score is None or score > best_score:
+                best_point = point
+                best_score = score
+        return best_point
+
+
+def get_book(path):
+    """Returns the OpeningBook at path, opened once per process so bots of many games can share it"""
+    if path not in book_cache:
+        book_cache[path] = OpeningBook(path)
+    return book_cache[path]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Builds an opening book from saved games')
+    parser.add_argument('output')
+    parser.add_argument('--input', default=None, help='text or archive file, default: ' + GameIO.filename)
+    parser.add_argument('--size', type=int, default=15, help='only games of this board size are used')
+    parser.add_argument('--max-plies', type=int, default=10, help='number of opening moves of each game used')
+    parser.add_argument('--min-games', type=int, default=2, help='moves played in fewer games are left out')
+    args = parser.parse_args()
+
+    count = build_book(args.output, args.size, path=args.input, max_plies=args.max_plies,
+                       min_games=args.min_games)
+    print('Wrote {} book entries'.format(count))
+
+
+if __name__ == '__main__':
+    main()
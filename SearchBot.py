@@ -0,0 +1,252 @@
+import time
+
+from Game import Game
+from GameBot import GameBot, lose_score_table
+from ThreatSolver import ThreatSolver, get_forced_move
+
+# Value of a won position. Wins found closer to the root score higher (win_value - ply)
+win_value = 10 ** 9
+# Scores at least this high (or low) are wins (or losses)
+win_threshold = win_value - 1000
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget of the move is used up"""
+
+
+class TranspositionTable:
+    """
+    Fixed size transposition table indexed by the low bits of the position hash
+    An entry is replaced by a deeper search of the same generation, or by anything from a newer generation
+    """
+
+    exact = 0
+    lower = 1  # value is a lower bound (search failed high)
+    upper = 2  # value is an upper bound (search failed low)
+
+    def __init__(self, size=1 << 16):
+        # Round size up to a power of 2 so indexing is a mask
+        size = 1 << max(size - 1, 1).bit_length()
+        self.mask = size - 1
+        # Entries are tuples (key, depth, value, flag, move, generation)
+        self.entries = [None] * size
+        self.generation = 0
+
+    def new_generation(self):
+        """Called at the start of every search, so entries of older searches get replaced first"""
+        self.generation += 1
+
+    def get(self, key):
+        """Returns the entry for key, or None"""
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def put(self, key, depth, value, flag, move):
+        index = key & self.mask
+        entry = self.entries[index]
+        if entry is None or entry[5] != self.generation or entry[0] == key or depth >= entry[1]:
+            self.entries[index] = (key, depth, value, flag, move, self.generation)
+
+
+class SearchBot:
+    """
+    Connect5 AI using negamax alpha-beta search with iterative deepening and a transposition table
+    Candidate moves are the best points of the GameBot heuristic. Follows the same bot protocol as GameBot
+    """
+
+    def __init__(self, game, side, time_limit=1.0, max_depth=20, width=8, table_size=1 << 16,
+                 solver_nodes=2000, book=None):
+        """
+        time_limit: seconds to search for each move
+        max_depth: maximum depth (plies) of iterative deepening
+        width: number of candidate moves searched in each position
+        table_size: number of entries in the transposition table
+        solver_nodes: node budget of the threat solver run before searching (0: no solver)
+        book: OpeningBook queried before searching
+        """
+        self.game = game
+        self.side = side
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.width = width
+
+        # Tracks win / lose conditions of the real game, from the perspective of side
+        self.evaluator = GameBot(game, side)
+        self.book = book
+        self.solver = ThreatSolver(game, self.evaluator, max_nodes=solver_nodes) if solver_nodes else None
+        self.table = TranspositionTable(table_size)
+
+        # Statistics of the last search
+        self.depth = 0
+        self.nodes = 0
+        self.search_time = 0
+        self.nodes_per_second = 0
+
+        # Search state
+        self.deadline = 0
+        self.stopped = False
+
+    def new_move(self, point, side):
+        """Updates win and lose conditions with latest move"""
+        self.evaluator.new_move(point, side)
+
+    def stop(self):
+        """
+        Ends the move being computed as soon as possible, from another thread (e.g. when the game is abandoned)
+        Later moves are not searched, so the bot is no longer usable
+        """
+        self.stopped = True
+        if self.solver is not None:
+            self.solver.deadline = 0
+
+    def get_next_move(self):
+        """Returns (x, y) for next move, or None if not bot's turn"""
+        if self.side != self.game.get_current_side() or self.stopped:
+            return None
+
+        # The solver's time counts against the time limit of the move
+        start = time.perf_counter()
+        self.deadline = start + self.time_limit
+        point = get_forced_move(self.game, self.book, self.solver, self.deadline)
+        if point is not None:
+            return point
+
+        self.nodes = 0
+        self.depth = 0
+        self.table.new_generation()
+
+        # The search makes and undoes moves on the game and evaluator, so the position is restored afterwards
+        key = self.game.hash
+        moves = self.get_candidates(self.side, None)
+        if len(moves) == 0:
+            return None
+        best_move = moves[0]
+
+        # Iterative deepening. Each iteration reuses the table filled by the previous ones for move ordering
+        for depth in range(1, self.max_depth + 1):
+            try:
+                value = self.search(depth, -win_value, win_value, 0)
+            except SearchTimeout:
+                break
+            entry = self.table.get(key)
+            if entry is not None and entry[4] is not None:
+                best_move = entry[4]
+            self.depth = depth
+            if abs(value) >= win_threshold:
+                break  # result is already decided
+
+        self.search_time = time.perf_counter() - start
+        self.nodes_per_second = self.nodes / self.search_time if self.search_time > 0 else 0
+        return self.game.point_from_num(best_move)
+
+    def get_candidates(self, side, first_move):
+        """Returns the point numbers of the best empty points for side, best first (first_move before all)"""
+        moves = [int(move) for move in self.evaluator.get_top_moves(side, self.width)[0]]
+        if first_move is not None:
+            if first_move in moves:
+                moves.remove(first_move)
+            moves.insert(0, first_move)
+        return moves
+
+    def search(self, depth, alpha, beta, ply):
+        """Returns the negamax value of the current position for the side to move"""
+        self.nodes += 1
+        if self.stopped or time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        side = self.game.get_current_side()
+        key = self.game.hash
+        table_move = None
+        entry = self.table.get(key)
+        if entry is not None:
+            table_move = entry[4]
+            if entry[1] >= depth:
+                value = self.from_table_value(entry[2], ply)
+                if entry[3] == TranspositionTable.exact:
+                    return value
+                if entry[3] == TranspositionTable.lower:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        if depth == 0:
+            return self.evaluate(*self.evaluator.get_conditions(side))
+
+        moves = self.get_candidates(side, table_move)
+        if len(moves) == 0:
+            return 0  # board full - tie
+
+        original_alpha = alpha
+        best_value = -win_value
+        best_move = moves[0]
+        for move in moves:
+            point = self.game.point_from_num(move)
+            self.evaluator.place(point, side)
+            try:
+                if self.game.check_win(side):
+                    value = win_value - ply
+                else:
+                    value = -self.search(depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                self.evaluator.undo()
+
+            if value > best_value:
+                best_value = value
+                best_move = move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if best_value <= original_alpha:
+            flag = TranspositionTable.upper
+        elif best_value >= beta:
+            flag = TranspositionTable.lower
+        else:
+            flag = TranspositionTable.exact
+        self.table.put(key, depth, self.to_table_value(best_value, ply), flag, best_move)
+        return best_value
+
+    def evaluate(self, own, opp):
+        """Returns the static value of a position for the side with conditions own"""
+        return float(lose_score_table[own + 1].sum() - lose_score_table[opp + 1].sum())
+
+    @staticmethod
+    def to_table_value(value, ply):
+        """Stores win / loss values relative to the position instead of the root"""
+        if value >= win_threshold:
+            return value + ply
+        if value <= -win_threshold:
+            return value - ply
+        return value
+
+    @staticmethod
+    def from_table_value(value, ply):
+        if value >= win_threshold:
+            return value - ply
+        if value <= -win_threshold:
+            return value + ply
+        return value
+
+
+def main():
+    game = Game(size=15)
+    bots = {1: SearchBot(game, 1, time_limit=0.5), 2: GameBot(game, 2)}
+    while game.check_game_status() == 0:
+        side = game.get_current_side()
+        point = bots[side].get_next_move()
+        game.place(point, side)
+        for bot in bots.values():
+            bot.new_move(point, side)
+    game.print_board()
+    print('Status: ' + str(game.check_game_status()))
+    search_bot = bots[1]
+    print('Last search: depth {}, {} nodes, {:.0f} nodes/s'.format(
+        search_bot.depth, search_bot.nodes, search_bot.nodes_per_second))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+import time
+import numpy as np
+
+from Game import Game
+from GameBot import GameBot, get_condition_points
+
+
+class BudgetExceeded(Exception):
+    """Raised inside the solver when the node budget or the time of the solve is used up"""
+
+
+class ThreatSolver:
+    """
+    Threat-space solver looking for forced wins of the side to move (the attacker)
+    VCF (victory by continuous fours): every attacking move makes four, so the defender's reply is forced
+    VCT (victory by continuous threats, threes=True): attacking moves can also make threes that become an
+        open four if ignored. Defender replies are limited to points of the attacker's threat conditions and
+        the defender's own fours, as usual in threat-space search
+    Works on win_conditions / lose_conditions of a GameBot, making and undoing moves on the game and bot
+    """
+
+    def __init__(self, game, evaluator=None, max_nodes=10000, max_depth=20, threes=False):
+        """
+        evaluator: GameBot tracking game, from either side's perspective (default: a new GameBot)
+        max_nodes: node budget of each solve
+        max_depth: maximum number of attacking moves in a sequence
+        """
+        self.game = game
+        self.evaluator = evaluator if evaluator is not None else GameBot(game, game.get_current_side())
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.threes = threes
+        self.condition_points = get_condition_points(game.size)
+
+        # Statistics of the last solve
+        self.nodes = 0
+        self.complete = False  # whether the last solve finished within the node budget and deadline
+
+        self.deadline = None
+        self.attacker = None
+        self.board = None
+        self.failed = {}  # hash -> depth of positions where the attacker was shown to have no win
+
+    def solve(self, deadline=None):
+        """
+        Returns the winning sequence of points for the side to move (attacker and defender moves alternating,
+        ending with five in a row), or None if no forced win was found
+        deadline: time.perf_counter() value at which the solve gives up, like when the node budget runs out
+        complete tells whether None means no win exists (within max_depth) or the budget ran out
+        """
+        self.nodes = 0
+        self.deadline = deadline
+        self.failed = {}
+        self.attacker = self.game.get_current_side()
+        self.board = np.array(self.game.board, dtype=np.int8).reshape(-1)
+        sequence = None
+        try:
+            # Deepen one attacking move at a time, so the shortest win is found first
+            for depth in range(1, self.max_depth + 1):
+                sequence = self.attack(depth)
+                if sequence is not None:
+                    break
+            self.complete = True
+        except BudgetExceeded:
+            sequence = None
+            self.complete = False
+        if sequence is None:
+            return None
+        return [self.game.point_from_num(move) for move in sequence]
+
+    def get_conditions(self, side):
+        """Returns (own, opponent) flattened conditions from the perspective of side"""
+        own, opponent = self.evaluator.get_conditions(side)
+        return own.reshape(-1), opponent.reshape(-1)
+
+    def empty_points(self, conditions, count):
+        """Returns the distinct empty points of the conditions holding count pieces"""
+        points = self.condition_points[np.nonzero(conditions == count)[0]].reshape(-1)
+        points = points[points >= 0]
+        return np.unique(points[self.board[points] == 0])
+
+    def attack(self, depth):
+        """Returns the winning sequence (point numbers) for the attacker to move, or None"""
+        self.count_node()
+        own, opponent = self.get_conditions(self.attacker)
+
+        wins = self.empty_points(own, 4)
+        if len(wins) > 0:
+            return [int(wins[0])]
+        if depth == 0 or self.failed.get(self.game.hash, -1) >= depth:
+            return None
+
+        defender_fours = self.empty_points(opponent, 4)
+        if len(defender_fours) > 1:
+            return None  # cannot block both
+        if len(defender_fours) == 1:
+            # Must block, and the block must be a threat itself
+            moves = defender_fours
+        else:
+            moves = self.empty_points(own, 3)
+            if self.threes:
+                # Fours first, then threes
+                moves = np.concatenate([moves, np.setdiff1d(self.empty_points(own, 2), moves)])
+
+        for move in moves:
+            move = int(move)
+            self.make_move(move, self.attacker)
+            try:
+                sequence = self.defend(depth)
+            finally:
+                self.undo_move(move)
+            if sequence is not None:
+                return [move] + sequence
+
+        self.failed[self.game.hash] = depth
+        return None
+
+    def defend(self, depth):
+        """
+        Returns the winning sequence for the attacker after the attacker's last move, with the defender to move,
+        or None if the move was not a threat or the defender escapes
+        """
+        defender = 3 - self.attacker
+        own, opponent = self.get_conditions(self.attacker)
+
+        fours = self.empty_points(own, 4)
+        if len(fours) > 1:
+            # Defender cannot block both, unless it wins first
+            if len(self.empty_points(opponent, 4)) > 0:
+                return None
+            return [int(fours[0]), int(fours[1])]
+        if len(fours) == 1:
+            replies = fours
+        elif self.threes and self.is_three(own):
+            # Replies on the points of the threat, or the defender's own fours
+            replies = np.union1d(self.empty_points(own, 3), self.empty_points(opponent, 3))
+        else:
+            return None  # not a threat
+        if len(self.empty_points(opponent, 4)) > 0:
+            return None  # defender wins first
+
+        line = None
+        for reply in replies:
+            reply = int(reply)
+            self.make_move(reply, defender)
+            try:
+                if self.game.check_win(defender):
+                    sequence = None
+                else:
+                    sequence = self.attack(depth - 1)
+            finally:
+                self.undo_move(reply)
+            if sequence is None:
+                return None  # defender escapes
+            # Keep the longest line as the main line
+            if line is None or len(sequence) + 1 > len(line):
+                line = [reply] + sequence
+        return line
+
+    def is_three(self, own):
+        """Returns whether the attacker has a point making two different fours (an open four) in one move"""
+        conditions = np.nonzero(own == 3)[0]
+        if len(conditions) < 2:
+            return False
+        points = self.condition_points[conditions]
+        empty = (points >= 0) & (self.board[np.maximum(points, 0)] == 0)
+        # Every condition with 3 pieces has 2 empty points. Playing one leaves the other to complete five
+        completions = {}
+        for condition_points, condition_empty in zip(points, empty):
+            first, second = condition_points[condition_empty]
+            completions.setdefault(first, set()).add(second)
+            completions.setdefault(second, set()).add(first)
+        return any(len(completed) > 1 for completed in completions.values())
+
+    def count_node(self):
+        self.nodes += 1
+        if self.nodes > self.max_nodes or (self.deadline is not None and time.perf_counter() > self.deadline):
+            raise BudgetExceeded()
+
+    def make_move(self, move, side):
+        self.evaluator.place(self.game.point_from_num(move), side)
+        self.board[move] = side
+
+    def undo_move(self, move):
+        self.evaluator.undo()
+        self.board[move] = 0
+
+
+def get_forced_move(game, book=None, solver=None, deadline=None):
+    """
+    Returns the point a searching bot plays without searching, or None: the move of the opening book,
+    else the first move of a forced win found by the solver (much faster than by searching)
+    deadline: time.perf_counter() value the solver stops at, the deadline of the bot's move
+    """
+    if book is not None:
+        point = book.get_move(game)
+        if point is not None:
+            return point
+    if solver is not None:
+        line = solver.solve(deadline)
+        if line is not None:
+            return line[0]
+    return None
+
+
+def solve(game, evaluator=None, max_nodes=10000, threes=False):
+    """Returns the winning sequence of points for the side to move, or None. See ThreatSolver"""
+    return ThreatSolver(game, evaluator, max_nodes=max_nodes, threes=threes).solve()
+
+
+def main():
+    # Side 1 to move wins by continuous fours
+    game = Game(size=15)
+    for point in [(7, 7), (0, 0), (8, 7), (0, 2), (9, 7), (0, 4), (7, 8), (14, 0), (7, 9), (14, 2)]:
+        game.place(point, game.get_current_side())
+    game.print_board()
+    print(solve(game))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import numpy as np
+
+from GameAnalysis import run_analysis
+from GameArena import get_bot_init
+
+
+def write_games(path, lines):
+    path.write_text(''.join(line + '\n' for line in lines))
+    return str(path)
+
+
+def test_invalid_moves_stop_the_game(tmp_path):
+    # Repeated move at ply 2, off the board move at ply 1, then a valid game
+    path = write_games(tmp_path / 'games.txt', ['0 9 4 1 2 1 3', '0 9 3 1 99 5', '0 9 4 40 41 31 30'])
+    output = str(tmp_path / 'analysis.npz')
+    stats = run_analysis(get_bot_init('GameBot', 0.1), 'test', output, path=path, size=9, processes=1)
+    assert stats['games'] == 3
+    assert stats['invalid_games'] == 2
+    data = np.load(output)
+    assert data['game'].tolist() == [0, 0, 1, 2, 2, 2, 2]
+    assert data['ply'].tolist() == [0, 1, 0, 0, 1, 2, 3]
+    assert data['played'].tolist() == [1, 2, 1, 40, 41, 31, 30]
+
+
+def test_columns_match_scores_and_cache(tmp_path):
+    path = write_games(tmp_path / 'games.txt', ['0 9 6 40 41 31 30 22 49', '0 9 4 10 20 30 40'])
+    cache_path = str(tmp_path / 'cache.sqlite')
+    outputs = [str(tmp_path / 'first.npz'), str(tmp_path / 'second.npz')]
+    for output in outputs:
+        run_analysis(get_bot_init('GameBot', 0.1), 'test', output, path=path, size=9, k=3, cache_path=cache_path,
+                     processes=1)
+    first, second = np.load(outputs[0]), np.load(outputs[1])
+    assert len(first['ply']) == 10
+    assert second['cached'].all()
+    for name in ['game', 'ply', 'hash', 'best', 'top_moves', 'position']:
+        assert np.array_equal(first[name], second[name])
+    scores = first['scores']
+    assert np.array_equal(first['played_score'], scores[np.arange(len(scores)), first['played']], equal_nan=True)
+    assert np.array_equal(first['top_moves'][:, 0], first['best'])
+    assert np.array_equal(first['top_scores'][:, 0], np.nanmax(scores, axis=1))
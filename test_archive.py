@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+from Game import Game
+from GameArchive import GameArchive, GameArchiveWriter, archive_to_text, text_to_archive
+
+
+def random_games(count, seed):
+    """Returns games of random sizes played with random candidates, finished or stopped early"""
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        game = Game(size=rng.choice([5, 9, 15, 19]))
+        for _ in range(rng.randrange(game.size * game.size)):
+            if game.check_game_status() != 0:
+                break
+            game.place(game.point_from_num(rng.choice(game.get_candidates())), game.get_current_side())
+        games.append(game)
+    return games
+
+
+def test_archive_round_trip(tmp_path):
+    games = random_games(30, 0) + [Game(size=9)]
+    path = str(tmp_path / 'games.c5ga')
+    with GameArchiveWriter(path) as writer:
+        for game in games:
+            writer.add_game(game)
+    archive = GameArchive(path)
+    assert len(archive) == len(games)
+    for k, game in enumerate(games):
+        size, result, moves = archive[k]
+        assert size == game.size
+        assert moves.tolist() == game.moves
+        assert archive.get_game_str(k) == game.game_str()
+        loaded = archive.get_game(k)
+        assert loaded.board == game.board
+        assert loaded.check_game_status() == game.check_game_status()
+        assert archive.get_game(k, ply=len(game.moves) // 2).moves == game.moves[:len(game.moves) // 2]
+    assert [moves.tolist() for _, _, moves in archive] == [game.moves for game in games]
+
+
+def test_text_round_trip(tmp_path):
+    text = ''.join(game.game_str() + '\n' for game in random_games(20, 1))
+    text_path, archive_path, copy_path = tmp_path / 'games.txt', tmp_path / 'games.c5ga', tmp_path / 'copy.txt'
+    text_path.write_text(text)
+    assert text_to_archive(str(archive_path), str(text_path)) == 20
+    assert archive_to_text(str(archive_path), str(copy_path)) == 20
+    assert copy_path.read_text() == text
+
+
+def test_not_an_archive(tmp_path):
+    path = tmp_path / 'games.txt'
+    path.write_bytes(bytes(64))
+    with pytest.raises(ValueError):
+        GameArchive(str(path))
@@ -0,0 +1,71 @@
+import random
+
+import numpy as np
+import pytest
+
+from BatchGame import BatchGame, BatchGameBot
+from Game import Game
+from GameBot import GameBot
+
+
+@pytest.mark.parametrize('size, seed', [(size, seed) for size in [5, 9, 15] for seed in range(3)])
+def test_step_matches_game(size, seed):
+    rng = random.Random(seed)
+    batch_size = 8
+    batch_game = BatchGame(batch_size, size, auto_reset=False)
+    games = [Game(size=size) for _ in range(batch_size)]
+    while not all(game.check_game_status() != 0 for game in games):
+        # Mostly candidates, with some occupied, off the board and skipped moves
+        moves = [rng.choice(game.get_candidates()) if game.get_candidates() and rng.random() < 0.8
+                 else rng.choice([-1, size * size, rng.randrange(size * size)]) for game in games]
+        expected_legal = [game.check_game_status() == 0 and 0 <= move < size * size and
+                          game.get_point(game.point_from_num(move)) == 0 for game, move in zip(games, moves)]
+        legal, status, done = batch_game.step(moves)
+        assert legal.tolist() == expected_legal
+        for b, game in enumerate(games):
+            if legal[b]:
+                game.place(game.point_from_num(moves[b]), game.get_current_side())
+            assert batch_game.boards[b].tolist() == game.board
+            assert batch_game.get_game(b).moves == game.moves
+            assert status[b] == game.check_game_status()
+            assert done[b] == (game.check_game_status() != 0)
+
+
+def test_auto_reset_saves_finished_games():
+    batch_game = BatchGame(2, 9)
+    # Board 0 wins with 1, 2, 3, 4, 5 while board 1 keeps playing
+    for moves in [[1, 0], [10, 80], [2, 18], [11, 79], [3, 36], [12, 78], [4, 54], [13, 77]]:
+        legal, status, done = batch_game.step(moves)
+        assert legal.all() and not done.any()
+    legal, status, done = batch_game.step([5, 9])
+    assert done.tolist() == [True, False]
+    assert status.tolist() == [1, 0]
+    assert batch_game.finished_games == [([1, 10, 2, 11, 3, 12, 4, 13, 5], 1)]
+    assert batch_game.move_counts.tolist() == [0, 9]
+    assert not batch_game.boards[0].any()
+
+
+@pytest.mark.parametrize('size, seed', [(size, seed) for size in [5, 9, 15] for seed in range(3)])
+def test_next_moves_match_game_bot(size, seed):
+    rng = random.Random(seed)
+    batch_size = 6
+    batch_game = BatchGame(batch_size, size, auto_reset=False)
+    # Boards start from random openings of different lengths so sides to move differ
+    for b in range(batch_size):
+        game = Game(size=size)
+        for _ in range(rng.randrange(6)):
+            game.place(game.point_from_num(rng.choice(game.get_candidates())), game.get_current_side())
+        batch_game.load_game(b, game)
+    batch_bot = BatchGameBot(batch_game)
+    while not batch_game.status.all():
+        games = [batch_game.get_game(b) for b in range(batch_size)]
+        random.seed(seed * 1000 + int(batch_game.move_counts.sum()))
+        expected = []
+        for game in games:
+            point = GameBot(game, game.get_current_side()).get_next_move() if game.check_game_status() == 0 else None
+            expected.append(-1 if point is None else game.point_num(point))
+        random.seed(seed * 1000 + int(batch_game.move_counts.sum()))
+        moves = batch_bot.get_next_moves()
+        assert moves.tolist() == expected
+        batch_game.step(moves)
+    assert np.array_equal(batch_game.status, [batch_game.get_game(b).check_game_status() for b in range(batch_size)])
@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+from BitBoard import BitBoard, BitGame
+from Game import Game
+
+
+def random_moves(size, seed):
+    """Returns the moves of a game played with random candidates until it is finished"""
+    rng = random.Random(seed)
+    game = Game(size=size)
+    while game.check_game_status() == 0:
+        game.place(game.point_from_num(rng.choice(game.get_candidates())), game.get_current_side())
+    return game.moves
+
+
+def assert_same_game(bit_game, game):
+    assert bit_game.board == game.board
+    assert bit_game.moves == game.moves
+    assert bit_game.hash == game.hash
+    assert bit_game.symmetry_hashes == game.symmetry_hashes
+    assert bit_game.get_candidates() == game.get_candidates()
+    assert bit_game.check_game_status() == game.check_game_status()
+    for side in [1, 2]:
+        assert bit_game.check_win(side) == game.check_win(side)
+        assert bit_game.check_win(side, full_scan=True) == game.check_win(side)
+        assert bit_game.bitboard.has_five(side) == game.check_win(side)
+
+
+@pytest.mark.parametrize('size, seed', [(size, seed) for size in [5, 9, 15, 19] for seed in range(3)])
+def test_place_and_undo_match_game(size, seed):
+    moves = random_moves(size, seed)
+    game, bit_game = Game(size=size), BitGame(size=size)
+    for move in moves:
+        point = game.point_from_num(move)
+        assert bit_game.place(point, bit_game.get_current_side())
+        game.place(point, game.get_current_side())
+        assert not bit_game.place(point, bit_game.get_current_side())
+        assert_same_game(bit_game, game)
+    while moves:
+        assert bit_game.undo() == game.undo()
+        moves = moves[:-1]
+        assert_same_game(bit_game, game)
+
+
+@pytest.mark.parametrize('size, seed', [(size, seed) for size in [5, 9, 15, 19] for seed in range(3)])
+def test_packed_round_trip(size, seed):
+    moves = random_moves(size, seed)
+    for ply in range(0, len(moves) + 1, 5):
+        game = Game.from_moves(moves, size, ply)
+        bit_game = BitGame.from_moves(moves, size, ply)
+        assert_same_game(bit_game, game)
+        assert_same_game(BitGame.from_packed(bit_game.pack(), game.moves), game)
+        assert_same_game(BitGame.from_bytes(size, bit_game.pack_bytes(), game.moves), game)
+        # Without moves, only the position is restored
+        restored = BitGame.from_packed(bit_game.pack())
+        assert restored.board == game.board
+        assert restored.hash == game.hash
+        assert restored.get_candidates() == game.get_candidates()
+        assert restored.check_game_status() == game.check_game_status(full_scan=True)
+
+
+def test_bitboard_list_round_trip():
+    game = Game.from_moves(random_moves(9, 0), 9)
+    bitboard = BitBoard(9)
+    bitboard.from_list(game.board)
+    assert bitboard.to_list() == game.board
+    other = BitBoard(9)
+    other.load_bits(bitboard.bits[1], bitboard.bits[2])
+    assert other.lines == bitboard.lines
+    assert other.to_bytes() == bitboard.to_bytes()
+    # Emptying a point clears its line bits too
+    for y in range(9):
+        for x in range(9):
+            other.set((x, y), 0)
+    assert other.bits == [0, 0, 0]
+    assert other.lines == [None, [0] * 4, [0] * 4]
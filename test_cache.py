@@ -0,0 +1,55 @@
+import threading
+import time
+from collections import OrderedDict
+
+from EvalCache import EvalCache
+from Game import Game
+from GameBot import GameBot
+
+
+class YieldingDict(OrderedDict):
+    """Entries letting other threads run between a lookup and the update that follows it"""
+
+    def get(self, key, default=None):
+        value = super().get(key, default)
+        time.sleep(0.0001)
+        return value
+
+    def __contains__(self, key):
+        found = super().__contains__(key)
+        time.sleep(0.0001)
+        return found
+
+
+def test_concurrent_get_and_evict():
+    cache = EvalCache(max_entries=2)
+    cache.entries = YieldingDict()
+    errors = []
+
+    def work(offset):
+        try:
+            for i in range(200):
+                key = (offset + i) % 4
+                if cache.get(key) is None:
+                    cache.put(key, i)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(cache) == 2
+    assert cache.bytes == sum(size for _, size in cache.entries.values())
+
+
+def test_key_includes_candidate_radius():
+    cache = EvalCache()
+    for radius in [1, 2]:
+        game = Game(size=9, moves=[40], radius=radius)
+        GameBot(game, 2, cache=cache, candidates=True).get_next_move()
+    game = Game(size=9, moves=[40])
+    GameBot(game, 2, cache=cache).get_next_move()
+    assert len(cache) == 3
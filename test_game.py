@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from Game import Game
+
+
+def play_random_game(size, seed):
+    """Returns a Game played with random moves near existing pieces until it is finished"""
+    rng = random.Random(seed)
+    game = Game(size=size)
+    while game.check_game_status() == 0:
+        game.place(game.point_from_num(rng.choice(game.get_candidates())), game.get_current_side())
+    return game
+
+
+@pytest.mark.parametrize('size, seed', [(size, seed) for size in [5, 9, 15] for seed in range(5)])
+def test_tracked_status_matches_full_scan(size, seed):
+    moves = play_random_game(size, seed).moves
+    game = Game(size=size)
+    for move in moves:
+        game.place(game.point_from_num(move), game.get_current_side())
+        for side in [1, 2]:
+            assert game.check_win(side) == game.check_win(side, full_scan=True)
+        assert game.check_game_status() == game.check_game_status(full_scan=True)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_undo_restores_empty_position(seed):
+    game = play_random_game(9, seed)
+    while game.undo() is not None:
+        assert game.check_game_status() == game.check_game_status(full_scan=True)
+    assert game.hash == 0
+    assert game.symmetry_hashes == [0] * 8
+    assert game.get_candidates() == [40]
+    assert game.candidates == set()
+    assert game.empty_count == 81
+
+
+@pytest.mark.parametrize('size, seed', [(size, seed) for size in [5, 9, 15] for seed in range(5)])
+def test_from_moves_matches_place(size, seed):
+    moves = play_random_game(size, seed).moves
+    game = Game(size=size)
+    # Tracked from the first move on, while loaded games compute them when first read
+    game.get_candidates()
+    game.symmetry_hashes
+    for ply, move in enumerate(moves + [None]):
+        loaded = Game.from_moves(moves, size, ply)
+        assert loaded.board == game.board
+        assert loaded.hash == game.hash
+        assert loaded.symmetry_hashes == game.symmetry_hashes
+        assert loaded.get_candidates() == game.get_candidates()
+        assert loaded.neighbor_counts == game.neighbor_counts
+        assert loaded.check_game_status() == game.check_game_status()
+        if move is not None:
+            game.place(game.point_from_num(move), game.get_current_side())
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_status_read_late_matches_tracked(seed):
+    moves = play_random_game(15, seed).moves
+    for ply in range(0, len(moves) + 1, 7):
+        game = Game.from_moves(moves, 15, ply)
+        # Nothing is read before placing the remaining moves and undoing some of them
+        for move in moves[ply:]:
+            game.place(game.point_from_num(move), game.get_current_side())
+        for _ in range(min(3, len(moves) - ply)):
+            game.undo()
+        tracked = Game.from_moves(moves, 15, len(game.moves))
+        assert game.hash == tracked.hash
+        assert game.symmetry_hashes == tracked.symmetry_hashes
+        assert game.get_candidates() == tracked.get_candidates()
+        assert game.check_game_status() == game.check_game_status(full_scan=True)
+        assert game.check_game_status() == tracked.check_game_status()
+        assert game.win_moves == tracked.win_moves
+        for side in [1, 2]:
+            assert game.check_win(side) == game.check_win(side, full_scan=True)
+
+
+def test_board_init_matches_place():
+    game = play_random_game(9, 0)
+    from_board = Game(board=[row[:] for row in game.board], moves=list(game.moves))
+    assert from_board.hash == game.hash
+    assert from_board.symmetry_hashes == game.symmetry_hashes
+    assert from_board.get_candidates() == game.get_candidates()
+    assert from_board.check_game_status() == game.check_game_status()
+    empty = Game(board=[[0] * 9 for _ in range(9)])
+    assert empty.check_game_status() == 0
@@ -0,0 +1,133 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from Game import Game
+from GameBot import GameBot
+
+
+class LoopBot:
+    """GameBot as it was before scoring with numpy, updating and scoring each condition in python loops"""
+
+    win_scores = [0, 10, 50, 200, 1000, math.inf]
+    lose_scores = [0, 10, 50, 200, 1000, 10000]
+
+    def __init__(self, game, side):
+        self.game = game
+        self.side = side
+        shape = game.size, game.size, 4
+        self.win_conditions = np.zeros(shape, dtype=int)
+        self.lose_conditions = np.zeros(shape, dtype=int)
+        self.init_conditions()
+
+    def init_conditions(self):
+        size = self.game.size
+        for x in range(size - 4, size):
+            for y in range(size):
+                for n in [0, 1]:
+                    self.win_conditions[x][y][n] = self.lose_conditions[x][y][n] = -1
+        for y in range(size - 4, size):
+            for x in range(size):
+                for n in [1, 2, 3]:
+                    self.win_conditions[x][y][n] = self.lose_conditions[x][y][n] = -1
+        for x in range(4):
+            for y in range(size):
+                self.win_conditions[x][y][3] = self.lose_conditions[x][y][3] = -1
+        for y in range(size):
+            for x in range(size):
+                value = self.game.get_point((x, y))
+                if value != 0:
+                    self.new_move((x, y), value)
+
+    def get_affected_conditions(self, point):
+        x, y = point
+        size = self.game.size
+        x_min_offset, x_max_offset = max(0, 5 - (size - x)), min(4, x)
+        y_min_offset, y_max_offset = max(0, 5 - (size - y)), min(4, y)
+        affected = []
+        for offset in range(x_min_offset, x_max_offset + 1):
+            affected.append((x - offset, y, 0))
+        for offset in range(max(x_min_offset, y_min_offset), min(x_max_offset, y_max_offset) + 1):
+            affected.append((x - offset, y - offset, 1))
+        for offset in range(y_min_offset, y_max_offset + 1):
+            affected.append((x, y - offset, 2))
+        for offset in range(max(4 - x_max_offset, y_min_offset), min(4 - x_min_offset, y_max_offset) + 1):
+            affected.append((x + offset, y - offset, 3))
+        return affected
+
+    def new_move(self, point, side):
+        for x, y, n in self.get_affected_conditions(point):
+            if side == self.side:
+                if self.win_conditions[x][y][n] != -1:
+                    self.win_conditions[x][y][n] += 1
+                self.lose_conditions[x][y][n] = -1
+            else:
+                if self.lose_conditions[x][y][n] != -1:
+                    self.lose_conditions[x][y][n] += 1
+                self.win_conditions[x][y][n] = -1
+
+    def get_best_points(self):
+        best_points = []
+        highest = 0
+        for y in range(self.game.size):
+            for x in range(self.game.size):
+                if self.game.get_point((x, y)) == 0:
+                    score = self.get_score((x, y))
+                    if score > highest:
+                        highest = score
+                        best_points = [(x, y)]
+                    elif score == highest:
+                        best_points.append((x, y))
+        return best_points
+
+    def get_next_move(self):
+        if self.side != self.game.get_current_side():
+            return None
+        best_points = self.get_best_points()
+        if len(best_points) == 0:
+            return None
+        return random.choice(best_points)
+
+    def get_score(self, point):
+        score = 0
+        for x, y, n in self.get_affected_conditions(point):
+            score += self.win_scores[self.win_conditions[x][y][n] + 1]
+            score += self.lose_scores[self.lose_conditions[x][y][n] + 1]
+        return score
+
+
+@pytest.mark.parametrize('size, seed', [(size, seed) for size in [5, 9, 15] for seed in range(4)])
+def test_moves_match_loop_scorer(size, seed):
+    game = Game(size=size)
+    bots = {side: GameBot(game, side) for side in [1, 2]}
+    loop_bots = {side: LoopBot(game, side) for side in [1, 2]}
+    while game.check_game_status() == 0:
+        side = game.get_current_side()
+        assert bots[side].get_best_points() == loop_bots[side].get_best_points()
+        random.seed(seed * 1000 + len(game.moves))
+        point = bots[side].get_next_move()
+        random.seed(seed * 1000 + len(game.moves))
+        assert point == loop_bots[side].get_next_move()
+        game.place(point, side)
+        for bot in list(bots.values()) + list(loop_bots.values()):
+            bot.new_move(point, side)
+
+
+@pytest.mark.parametrize('size, seed', [(size, seed) for size in [5, 9, 15] for seed in range(4)])
+def test_board_conditions_match_loop_init(size, seed):
+    rng = random.Random(seed)
+    game = Game(size=size)
+    tracked = {side: GameBot(game, side) for side in [1, 2]}
+    while game.check_game_status() == 0:
+        point = game.point_from_num(rng.choice(game.get_candidates()))
+        side = game.get_current_side()
+        game.place(point, side)
+        for side_bot in tracked.values():
+            side_bot.new_move(point, side)
+        for side in [1, 2]:
+            loop_bot = LoopBot(game, side)
+            for bot in [GameBot(game, side), tracked[side], GameBot.from_bot(tracked[3 - side], side=side)]:
+                assert np.array_equal(bot.win_conditions, loop_bot.win_conditions)
+                assert np.array_equal(bot.lose_conditions, loop_bot.lose_conditions)
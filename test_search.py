@@ -0,0 +1,26 @@
+import threading
+import time
+
+import pytest
+
+from Game import Game
+from MCTSBot import MCTSBot
+from SearchBot import SearchBot
+
+
+@pytest.mark.parametrize('bot_class', [SearchBot, MCTSBot])
+def test_stop_ends_the_move(bot_class):
+    game = Game(size=15, moves=[112, 113, 97])
+    bot = bot_class(game, 2, time_limit=30)
+    moves = []
+    thread = threading.Thread(target=lambda: moves.append(bot.get_next_move()))
+    thread.start()
+    time.sleep(0.2)
+    start = time.perf_counter()
+    bot.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert time.perf_counter() - start < 2
+    assert len(moves) == 1
+    # Later moves are not searched at all
+    assert bot.get_next_move() is None
@@ -0,0 +1,76 @@
+import asyncio
+
+from GameServer import GameServer, GameClient
+
+
+async def start_server(**kwargs):
+    """Returns a GameServer listening on a free port, and the port"""
+    server = GameServer(**kwargs)
+    listener = await server.start(port=0)
+    return server, listener.sockets[0].getsockname()[1]
+
+
+async def assert_stopped(server, server_game):
+    """Checks the game is closed and its bots stopped playing"""
+    await asyncio.sleep(0.1)
+    assert server_game.closed
+    assert server_game.game_id not in server.games
+    assert server_game.task is None or server_game.task.done()
+    bot_moves = server.bot_move_latency.count
+    await asyncio.sleep(0.3)
+    assert server.bot_move_latency.count == bot_moves
+
+
+def test_disconnect_stops_bot_game():
+    async def run():
+        server, port = await start_server(max_workers=2)
+        client = await GameClient.connect(port=port)
+        response = await client.request({'type': 'new_game', 'size': 25, 'bots': {'1': 'GameBot', '2': 'GameBot'}})
+        server_game = server.games[response['game_id']]
+        await client.close()
+        await assert_stopped(server, server_game)
+        assert server.get_metrics()['active_games'] == 0
+        await server.close()
+
+    asyncio.run(run())
+
+
+def test_close_stops_thinking_bot():
+    async def run():
+        server, port = await start_server(max_workers=2)
+        client = await GameClient.connect(port=port)
+        response = await client.request({'type': 'new_game', 'size': 15, 'bots': {'1': 'SearchBot'},
+                                         'time_limit': 0.2})
+        server_game = server.games[response['game_id']]
+        await asyncio.sleep(0.05)
+        await client.request({'type': 'close', 'game_id': response['game_id']})
+        await assert_stopped(server, server_game)
+        await client.close()
+        await server.close()
+
+    asyncio.run(run())
+
+
+def test_server_close_stops_bot_games():
+    async def run():
+        server, port = await start_server(max_workers=2)
+        client = await GameClient.connect(port=port)
+        response = await client.request({'type': 'new_game', 'size': 25, 'bots': {'1': 'GameBot', '2': 'GameBot'}})
+        server_game = server.games[response['game_id']]
+        await server.close()
+        await assert_stopped(server, server_game)
+        await client.close()
+
+    asyncio.run(run())
+
+
+def test_request_id_only_when_given():
+    async def run():
+        server, port = await start_server()
+        client = await GameClient.connect(port=port)
+        assert 'id' not in await client.request({'type': 'new_game', 'size': 9, 'bots': {}})
+        assert (await client.request({'type': 'new_game', 'size': 9, 'bots': {}, 'id': 7}))['id'] == 7
+        await client.close()
+        await server.close()
+
+    asyncio.run(run())
@@ -0,0 +1,31 @@
+import time
+
+from Game import Game
+from ThreatSolver import ThreatSolver
+
+
+def vcf_game():
+    """Returns a game where side 1 to move wins by continuous fours, see ThreatSolver.main"""
+    game = Game(size=15)
+    for point in [(7, 7), (0, 0), (8, 7), (0, 2), (9, 7), (0, 4), (7, 8), (14, 0), (7, 9), (14, 2)]:
+        game.place(point, game.get_current_side())
+    return game
+
+
+def test_solve_finds_win():
+    game = vcf_game()
+    solver = ThreatSolver(game)
+    line = solver.solve()
+    assert solver.complete
+    assert line is not None
+    for point in line:
+        assert game.place(point, game.get_current_side())
+    assert game.check_game_status() == 1
+
+
+def test_solve_stops_at_deadline():
+    game = vcf_game()
+    solver = ThreatSolver(game, max_nodes=10 ** 9)
+    assert solver.solve(deadline=time.perf_counter() - 1) is None
+    assert not solver.complete
+    assert solver.solve() is not None